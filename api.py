@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+
+from cache import BoardCache
+from circuit import CircuitBreaker
+from metrics import Counter, Gauge, Histogram
+from ratelimit import RateLimiter, backoff_delay, parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+
+# КОНСТАНТЫ
+BASE_URL = "https://keepthescore.com/api"
+HEADERS = {
+    'Content-Type': 'application/json',
+    'accept': '*/*'
+}
+
+# Настройки HTTP-клиента
+API_TIMEOUT = 10.0  # Общий таймаут на чтение/запись, секунды
+API_CONNECT_TIMEOUT = 5.0  # Таймаут установки соединения, секунды
+API_MAX_CONNECTIONS = 100  # Максимум одновременных соединений в пуле
+API_MAX_KEEPALIVE_CONNECTIONS = 20  # Сколько соединений держать открытыми между запросами
+API_KEEPALIVE_EXPIRY = 30.0  # Через сколько секунд простоя закрывать соединение
+
+# Настройки кэша досок
+BOARD_CACHE_SIZE = 1024  # Сколько досок держать в памяти
+BOARD_CACHE_TTL = 30.0  # Сколько секунд данные доски считаются свежими
+
+# Ограничение частоты и повторы запросов
+API_GLOBAL_RATE = 20.0  # Запросов в секунду ко всему API
+API_BOARD_RATE = 2.0  # Запросов в секунду к одной доске
+API_BOARD_BURST = 5  # Сколько запросов к одной доске можно отправить подряд без ожидания
+API_MAX_RETRIES = 3  # Сколько раз повторять неудавшийся запрос
+API_RETRY_BASE_DELAY = 0.5  # Базовая задержка экспоненциального отката, секунды
+API_RETRY_MAX_DELAY = 10.0  # Максимальная задержка перед повтором (в том числе по Retry-After), секунды
+
+# Повторять при любой ошибке можно только идемпотентные запросы; остальные — лишь если
+# сервер явно не начал их обрабатывать (429 или соединение не установлено)
+IDEMPOTENT_METHODS = ('GET', 'PUT', 'DELETE')
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+# Размыкатель цепи: после стольких ошибок подряд запросы к API сразу отклоняются
+API_FAILURE_THRESHOLD = 5
+API_PROBE_INTERVAL = 15.0  # Через сколько секунд после размыкания цепи пропустить пробный запрос
+
+# Пометка данных доски, взятых из кэша при недоступном API
+STALE_KEY = '_stale'
+
+METHODS_WITH_BODY = ('POST', 'PUT', 'PATCH')
+ALLOWED_METHODS = METHODS_WITH_BODY + ('GET', 'DELETE')
+
+# Метрики запросов к API
+api_duration = Histogram('scorebot_api_request_duration_seconds', "Время запроса к keepthescore",
+                         ['method', 'endpoint'])
+api_in_flight = Gauge('scorebot_api_in_flight', "Запросы к keepthescore, выполняющиеся сейчас")
+api_responses = Counter('scorebot_api_responses_total', "Ответы keepthescore по HTTP-статусам",
+                        ['method', 'endpoint', 'status'])
+board_cache_requests = Counter('scorebot_board_cache_requests_total',
+                               "Обращения к кэшу досок: hit, miss, coalesced, stale", ['result'])
+board_cache_size = Gauge('scorebot_board_cache_entries', "Досок в кэше")
+
+# Слушатели данных, проходящих через API (например, история очков). Вызываются как
+# listener(token, board_data) после каждого полученного снимка доски и
+# listener(token, method, endpoint, payload, result) после каждой удачной записи
+board_listeners = []
+write_listeners = []
+
+# Общий клиент с пулом соединений, создаётся лениво
+_client = None
+
+board_cache = BoardCache(max_size=BOARD_CACHE_SIZE, ttl=BOARD_CACHE_TTL)
+board_cache_size.function = lambda: len(board_cache)
+rate_limiter = RateLimiter(API_GLOBAL_RATE, API_BOARD_RATE, API_BOARD_BURST)
+# Размыкатель общий для всех досок, поэтому восстановление проверяет первый настоящий запрос
+# после паузы, а не запрос одной доски: ошибки одной доски не должны закрывать доступ к остальным
+circuit_breaker = CircuitBreaker(API_FAILURE_THRESHOLD, API_PROBE_INTERVAL)
+
+# Запросы доски, которые уже выполняются: token -> asyncio.Task
+_inflight_boards = {}
+# Доски, в которые писали, пока их чтение было в полёте: результат такого чтения не кэшируем
+_dirty_boards = set()
+
+
+def get_client():
+    """Возвращает общий асинхронный HTTP-клиент с пулом соединений."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=httpx.Timeout(API_TIMEOUT, connect=API_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=API_MAX_CONNECTIONS,
+                                max_keepalive_connections=API_MAX_KEEPALIVE_CONNECTIONS,
+                                keepalive_expiry=API_KEEPALIVE_EXPIRY),
+        )
+    return _client
+
+
+async def close_client():
+    """Закрывает HTTP-клиент, все соединения пула и фоновую проверку API."""
+    global _client
+    await circuit_breaker.close()
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def make_api_request(method, endpoint, token, payload=None):
+    """Универсальная функция для выполнения API-запросов."""
+    if method not in ALLOWED_METHODS:
+        raise ValueError(f"Неизвестный HTTP метод: {method}")
+
+    url = f"{BASE_URL}/{token}/{endpoint}"
+    content = json.dumps(payload) if method in METHODS_WITH_BODY else None
+    for attempt in range(API_MAX_RETRIES + 1):
+        if not circuit_breaker.allow_request():
+            logger.warning(f"API недоступен, запрос {method} {endpoint} отклонён без отправки")
+            api_responses.inc(method=method, endpoint=_endpoint_label(endpoint), status='circuit_open')
+            return None
+        await rate_limiter.acquire(token)
+        retry_after = None
+        try:
+            response = await _send(method, url, endpoint, content)
+            if response.status_code >= 500:
+                circuit_breaker.record_failure()
+            else:
+                circuit_breaker.record_success()
+            if response.status_code in RETRY_STATUSES and attempt < API_MAX_RETRIES and \
+                    (method in IDEMPOTENT_METHODS or response.status_code == 429):
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                logger.warning(f"API ответил {response.status_code} на {method} {endpoint}, повтор")
+            else:
+                response.raise_for_status()
+                result = response.json() if response.text else {}
+                break
+        except httpx.TransportError as e:
+            circuit_breaker.record_failure()
+            retryable = method in IDEMPOTENT_METHODS or isinstance(e, NOT_SENT_ERRORS)
+            if not retryable or attempt == API_MAX_RETRIES:
+                logger.error(f"Ошибка API: {e}")
+                return None
+            logger.warning(f"Ошибка соединения с API на {method} {endpoint}: {e}, повтор")
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Ошибка API: {e}")
+            return None
+
+        if retry_after is None:
+            retry_after = backoff_delay(attempt, API_RETRY_BASE_DELAY, API_RETRY_MAX_DELAY)
+        await asyncio.sleep(min(retry_after, API_RETRY_MAX_DELAY))
+
+    if method != 'GET':
+        await apply_write(token, method, endpoint, payload)
+        _notify(write_listeners, token, method, endpoint, payload, result)
+    return result
+
+
+def _notify(listeners, *args):
+    for listener in listeners:
+        try:
+            listener(*args)
+        except Exception as e:
+            logger.warning(f"Ошибка в слушателе API: {e}")
+
+
+async def _send(method, url, endpoint, content):
+    """Один HTTP-запрос к API с замером времени и учётом статуса ответа."""
+    label = _endpoint_label(endpoint)
+    api_in_flight.inc()
+    started = time.perf_counter()
+    status = 'error'
+    try:
+        response = await get_client().request(method, url, content=content)
+        status = str(response.status_code)
+        return response
+    finally:
+        api_in_flight.dec()
+        api_duration.observe(time.perf_counter() - started, method=method, endpoint=label)
+        api_responses.inc(method=method, endpoint=label, status=status)
+
+
+def _endpoint_label(endpoint):
+    """Эндпоинт без ID игрока, чтобы у метрик было ограниченное число меток."""
+    return 'player/{id}' if endpoint.startswith('player/') else endpoint
+
+
+async def get_board_data(token, allow_stale=False, fresh=False):
+    """Получение данных доски по токену (с кэшированием).
+
+    Одновременные запросы одной и той же доски из разных чатов объединяются
+    в один запрос к API, и все ожидающие получают один и тот же результат.
+    С allow_stale=True при недоступном API возвращаются последние известные
+    данные доски с пометкой (см. is_stale). С fresh=True кэш не читается:
+    данные запрашиваются у API (или берутся у уже идущего запроса) и обновляют кэш.
+    """
+    board_data = None if fresh else await board_cache.get(token)
+    if board_data is not None:
+        board_cache_requests.inc(result='hit')
+        return board_data
+
+    # При разомкнутой цепи запрос отклонит make_api_request (или пропустит как пробный)
+    task = _inflight_boards.get(token)
+    if task is None:
+        board_cache_requests.inc(result='miss')
+        task = asyncio.create_task(_fetch_board(token))
+        _inflight_boards[token] = task
+        task.add_done_callback(lambda done: _forget_inflight(token, done))
+    else:
+        board_cache_requests.inc(result='coalesced')
+    # shield: отмена одного из ожидающих не должна отменять запрос для остальных
+    board_data = await asyncio.shield(task)
+
+    if board_data is None and allow_stale:
+        stale = await board_cache.get_stale(token)
+        if stale is not None:
+            board_cache_requests.inc(result='stale')
+            return dict(stale, **{STALE_KEY: True})
+    return board_data
+
+
+def is_stale(board_data):
+    """Данные доски взяты из кэша, потому что API сейчас недоступен."""
+    return bool(board_data and board_data.get(STALE_KEY))
+
+
+async def _fetch_board(token):
+    """Запрашивает доску у API и кладёт результат в кэш."""
+    board_data = await make_api_request('GET', 'board', token)
+    if board_data and token not in _dirty_boards:
+        await board_cache.set(token, board_data)
+        if token in _dirty_boards:
+            # Запись успела пройти, пока данные сохранялись в кэш
+            await board_cache.invalidate(token)
+    _dirty_boards.discard(token)
+    if board_data:
+        _notify(board_listeners, token, board_data)
+    return board_data
+
+
+def _forget_inflight(token, task):
+    if _inflight_boards.get(token) is task:
+        del _inflight_boards[token]
+
+
+async def apply_write(token, method, endpoint, payload):
+    """Обновляет закэшированную доску после успешной записи или сбрасывает её.
+
+    Данные в кэше не меняются на месте: вместо этого сохраняется новая копия,
+    чтобы уже выданные обработчикам объекты оставались неизменными.
+    """
+    if token in _inflight_boards:
+        _dirty_boards.add(token)
+
+    if method == 'PATCH' and endpoint.startswith('player/') and payload and 'name' in payload:
+        player_id = endpoint.split('/', 1)[1]
+
+        def change(players):
+            return [dict(player, name=payload['name']) if str(player['id']) == player_id else player
+                    for player in players]
+    elif method == 'DELETE' and endpoint.startswith('player/'):
+        player_id = endpoint.split('/', 1)[1]
+
+        def change(players):
+            return [player for player in players if str(player['id']) != player_id]
+    elif method == 'POST' and endpoint == 'score' and payload:
+        player_id = str(payload['player_id'])
+
+        def change(players):
+            return [dict(player, score=player['score'] + payload['score']) if str(player['id']) == player_id
+                    else player for player in players]
+    else:
+        # Новый игрок, сброс очков, изменение доски: надёжнее перечитать доску целиком
+        await board_cache.invalidate(token)
+        return
+
+    def transform(board_data):
+        players = board_data.get('players')
+        return dict(board_data, players=change(players)) if isinstance(players, list) else None
+
+    await board_cache.update(token, transform)
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+
+from api import make_api_request
+
+logger = logging.getLogger(__name__)
+
+
+class ScoreBatcher:
+    """Копит изменения очков по (token, player_id) и отправляет их одним запросом.
+
+    Первое изменение для игрока запускает окно ожидания; всё, что пришло за это
+    время, суммируется и уходит в API одним POST score. По итогам каждого пакета
+    вызывается on_flush(token, player_id, delta, chat_ids, ok), чтобы сообщить
+    результат всем чатам, которые вносили изменения.
+    """
+
+    def __init__(self, window=2.0, on_flush=None):
+        self.window = window
+        self.on_flush = on_flush
+        self._pending = {}  # (token, player_id) -> [сумма изменений, множество chat_id]
+        self._timers = {}  # (token, player_id) -> asyncio.TimerHandle
+        self._flushing = set()  # Задачи отправки, которые ещё выполняются
+
+    def add(self, token, player_id, delta, chat_id):
+        """Добавляет изменение очков в пакет игрока."""
+        key = (token, player_id)
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = [0, set()]
+            self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._start_flush, key)
+        entry[0] += delta
+        entry[1].add(chat_id)
+
+    def pending_count(self):
+        """Количество пакетов, ожидающих отправки."""
+        return len(self._pending)
+
+    def _start_flush(self, key):
+        self._timers.pop(key, None)
+        task = asyncio.create_task(self._flush(key))
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self, key):
+        entry = self._pending.pop(key, None)
+        if entry is None:
+            return
+        delta, chat_ids = entry
+        token, player_id = key
+
+        if delta == 0:
+            # Изменения взаимно погасились, запрос не нужен
+            ok = True
+        else:
+            response = await make_api_request('POST', 'score', token, {
+                "player_id": player_id,
+                "score": delta
+            })
+            ok = response is not None
+        if not ok:
+            logger.error(f"Не удалось отправить пакет очков {delta:+d} для игрока {player_id}")
+
+        if self.on_flush:
+            try:
+                await self.on_flush(token, player_id, delta, chat_ids, ok)
+            except Exception as e:
+                logger.error(f"Ошибка при уведомлении о пакете очков: {e}")
+
+    async def flush_all(self):
+        """Немедленно отправляет все накопленные изменения (например, при остановке бота)."""
+        for key, timer in list(self._timers.items()):
+            timer.cancel()
+            self._start_flush(key)
+        if self._flushing:
+            await asyncio.gather(*self._flushing)
@@ -0,0 +1,117 @@
+"""Микробенчмарк маршрутизации нажатий: регулярные выражения против кодека callbacks.
+
+Сравнивает прежнюю схему (ConversationHandler по очереди проверяет
+CallbackQueryHandler состояния с шаблонами, ID разбирается через split) с одним
+CallbackRouter на состояние, а также сборку клавиатуры главного меню на каждый
+вызов с готовой. Для каждого варианта выводится время и пик выделенной памяти
+на вызов.
+
+Запуск: python -m bench.callback_routing --iterations 200000
+"""
+import argparse
+import time
+import tracemalloc
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import CallbackQueryHandler
+
+from bench.fake_telegram import UpdateFactory
+from callbacks import CallbackRouter, encode
+from keyboards import MAIN_MENU_KEYBOARD
+
+
+async def _noop(update, context):
+    pass
+
+
+# Обработчики состояния MAIN_MENU в прежнем порядке проверки
+MAIN_MENU_HANDLERS = [CallbackQueryHandler(_noop, pattern=pattern) for pattern in (
+    "^list_players$", "^list_(all|top)_", "^add_player$", "^edit_player$", "^delete_player$", "^edit_scores$",
+    "^board_rename$", "^reset_all$", "^bulk_scores$", "^boards$", "^switch_board_", "^add_board$",
+    "^aggregate_top$", "^main_menu$")]
+MAIN_MENU_ROUTER = CallbackRouter({action: _noop for action in (
+    "list_all", "list_top", "add_player", "edit_player", "delete_player", "edit_scores", "board_rename",
+    "reset_all", "bulk_scores", "boards", "switch_board", "add_board", "aggregate_top", "main_menu")})
+
+# Нажатия: (данные в старом формате, данные в новом формате)
+CLICKS = [
+    ("list_players", encode('list_all', 0)),
+    ("list_top_3", encode('list_top', 3)),
+    ("switch_board_2", encode('switch_board', 2)),
+    ("main_menu", encode('main_menu')),
+]
+
+
+def route_regex(update):
+    for handler in MAIN_MENU_HANDLERS:
+        if handler.check_update(update):
+            return handler, update.callback_query.data.split('_')[-1]
+    return None
+
+
+def route_codec(update):
+    callback = MAIN_MENU_ROUTER.check_update(update)
+    return MAIN_MENU_ROUTER.routes[callback.action], callback.args
+
+
+def build_main_menu():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("Список игроков", callback_data="list_players"),
+         InlineKeyboardButton("Добавить игрока", callback_data="add_player")],
+        [InlineKeyboardButton("Редактировать игрока", callback_data="edit_player"),
+         InlineKeyboardButton("Редактировать очки", callback_data="edit_scores")],
+        [InlineKeyboardButton("Переименовать доску", callback_data="board_rename"),
+         InlineKeyboardButton("Сбросить очки", callback_data="reset_all")],
+        [InlineKeyboardButton("Удалить игрока", callback_data="delete_player"),
+         InlineKeyboardButton("Очки списком", callback_data="bulk_scores")],
+        [InlineKeyboardButton("Доски", callback_data="boards")],
+    ])
+
+
+def reuse_main_menu():
+    return MAIN_MENU_KEYBOARD
+
+
+def measure(function, inputs, iterations):
+    """(нс на вызов, средний пик выделенной за вызов памяти в байтах)."""
+    rounds = max(1, iterations // len(inputs))
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for value in inputs:
+            function(value)
+    elapsed = time.perf_counter() - started
+
+    allocated = 0
+    tracemalloc.start()
+    for value in inputs:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        function(value)
+        allocated += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return elapsed / (rounds * len(inputs)) * 1e9, allocated / len(inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    factory = UpdateFactory()
+    old_clicks = [Update.de_json(factory.callback(1, old), None) for old, _ in CLICKS]
+    new_clicks = [Update.de_json(factory.callback(1, new), None) for _, new in CLICKS]
+    cases = [
+        ("маршрутизация: regex", route_regex, old_clicks),
+        ("маршрутизация: кодек", route_codec, new_clicks),
+        ("меню: сборка", lambda _: build_main_menu(), [None]),
+        ("меню: готовое", lambda _: reuse_main_menu(), [None]),
+    ]
+    print(f"{'вариант':<24}{'нс/вызов':>12}{'байт/вызов':>14}")
+    for name, function, inputs in cases:
+        iterations = args.iterations if 'маршрутизация' in name else max(1, args.iterations // 20)
+        nanoseconds, allocated = measure(function, inputs, iterations)
+        print(f"{name:<24}{nanoseconds:>12.0f}{allocated:>14.0f}")
+
+
+if __name__ == '__main__':
+    main()
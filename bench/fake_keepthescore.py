@@ -0,0 +1,148 @@
+"""Локальная замена keepthescore.com для нагрузочных тестов.
+
+Реализует те же эндпоинты, что использует make_api_request: board, player,
+player/<id>, score и board/reset-scores. Задержку и долю ошибок можно задать,
+а счётчики запросов показывают, сколько обращений к API стоило каждое действие.
+
+Запуск отдельно: python -m bench.fake_keepthescore --port 8765 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter
+
+
+class FakeKeepTheScore:
+    """HTTP-сервер на asyncio с доской в памяти для каждого токена."""
+
+    def __init__(self, players_per_board=30, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.players_per_board = players_per_board
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.boards = {}
+        self.calls = Counter()  # (метод, эндпоинт) -> количество
+        self._next_id = 1
+        self._server = None
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def _board(self, token):
+        board = self.boards.get(token)
+        if board is None:
+            players = {}
+            for number in range(self.players_per_board):
+                players[self._next_id] = {"id": self._next_id, "name": f"Игрок {number + 1}", "score": 0}
+                self._next_id += 1
+            board = self.boards[token] = {
+                "appearance": {"title": f"Доска {token}", "theme": "default", "layout": "default",
+                               "sorting": "desc", "score_format": "integer", "goal_value": None},
+                "players": players,
+            }
+        return board
+
+    def handle(self, method, path, payload):
+        """Обрабатывает запрос к API и возвращает (статус, тело ответа)."""
+        parts = path.strip('/').split('/')
+        if len(parts) < 3 or parts[0] != 'api':
+            return 404, {"error": "not found"}
+        token, endpoint = parts[1], '/'.join(parts[2:])
+        board = self._board(token)
+        self.calls[(method, endpoint.split('/')[0] if endpoint.startswith('player/') else endpoint)] += 1
+
+        if method == 'GET' and endpoint == 'board':
+            return 200, {"board": {"appearance": board["appearance"]}, "players": list(board["players"].values())}
+        if method == 'PUT' and endpoint == 'board':
+            board["appearance"].update(payload or {})
+            return 200, {"board": {"appearance": board["appearance"]}}
+        if method == 'POST' and endpoint == 'board/reset-scores':
+            for player in board["players"].values():
+                player["score"] = 0
+            return 200, {"ok": True}
+        if method == 'POST' and endpoint == 'player':
+            player = {"id": self._next_id, "name": payload["name"], "score": 0}
+            board["players"][self._next_id] = player
+            self._next_id += 1
+            return 200, player
+        if method == 'POST' and endpoint == 'score':
+            player = board["players"].get(int(payload["player_id"]))
+            if player is None:
+                return 404, {"error": "player not found"}
+            player["score"] += payload["score"]
+            return 200, player
+        if endpoint.startswith('player/'):
+            player_id = int(endpoint.split('/')[1])
+            if player_id not in board["players"]:
+                return 404, {"error": "player not found"}
+            if method == 'PATCH':
+                board["players"][player_id].update(payload or {})
+                return 200, board["players"][player_id]
+            if method == 'DELETE':
+                return 200, board["players"].pop(player_id)
+        return 404, {"error": "not found"}
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, value = line.decode().split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                payload = json.loads(body) if body else None
+
+                if self.latency or self.jitter:
+                    await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+                if self.error_rate and random.random() < self.error_rate:
+                    status, response = 500, {"error": "injected"}
+                else:
+                    status, response = self.handle(method, path, payload)
+
+                data = json.dumps(response, ensure_ascii=False).encode()
+                writer.write(f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Запускает сервер и возвращает базовый URL для api.BASE_URL."""
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}/api"
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+async def _serve_forever(args):
+    server = FakeKeepTheScore(args.players, args.latency, args.jitter, args.error_rate)
+    print(f"Фейковый keepthescore: {await server.start(args.host, args.port)}")
+    await asyncio.Event().wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--players', type=int, default=30, help="игроков на новой доске")
+    parser.add_argument('--latency', type=float, default=0.0, help="задержка ответа, секунды")
+    parser.add_argument('--jitter', type=float, default=0.0, help="случайная добавка к задержке, секунды")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля ответов 500")
+    asyncio.run(_serve_forever(parser.parse_args()))
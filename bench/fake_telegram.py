@@ -0,0 +1,73 @@
+"""Фейковый транспорт Bot API и генератор синтетических обновлений Telegram.
+
+FakeTelegramRequest подменяет HTTP-запросы бота к Telegram мгновенными
+ответами, поэтому настоящие обработчики из main.py можно гонять без сети.
+"""
+import itertools
+import json
+from collections import Counter
+
+from telegram.request import BaseRequest
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "ScoreBot", "username": "score_bot"}
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Отвечает на запросы к Bot API так, как ответил бы Telegram, и считает их."""
+
+    def __init__(self):
+        self.calls = Counter()  # метод Bot API -> количество
+        self._message_ids = itertools.count(1000)
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit('/', 1)[1]
+        params = request_data.parameters if request_data else {}
+        self.calls[endpoint] += 1
+        if endpoint == 'getMe':
+            result = BOT_USER
+        elif endpoint in ('sendMessage', 'editMessageText'):
+            result = {"message_id": params.get('message_id') or next(self._message_ids), "date": 0,
+                      "chat": {"id": params.get('chat_id', 0), "type": "private"},
+                      "from": BOT_USER, "text": params.get('text', '')}
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+class UpdateFactory:
+    """Строит JSON синтетических обновлений Telegram от имени разных чатов."""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+
+    @staticmethod
+    def _user(chat_id):
+        return {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+
+    def message(self, chat_id, text):
+        """Текстовое сообщение (команды получают entity bot_command)."""
+        update_id = next(self._update_ids)
+        message = {"message_id": update_id, "date": 0, "chat": {"id": chat_id, "type": "private"},
+                   "from": self._user(chat_id), "text": text}
+        if text.startswith('/'):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": update_id, "message": message}
+
+    def callback(self, chat_id, data):
+        """Нажатие inline-кнопки с callback_data=data."""
+        update_id = next(self._update_ids)
+        return {"update_id": update_id, "callback_query": {
+            "id": str(update_id), "chat_instance": str(chat_id), "data": data, "from": self._user(chat_id),
+            "message": {"message_id": 1, "date": 0, "chat": {"id": chat_id, "type": "private"},
+                        "from": BOT_USER, "text": ""}}}
@@ -0,0 +1,173 @@
+"""Нагрузочный тест обработчиков бота на локальной замене keepthescore.
+
+Каждый синтетический чат проходит типичный сценарий (старт, просмотр списка,
+изменение очков, переименование и добавление игрока, переименование доски) через настоящий ConversationHandler из
+main.build_application(). Чаты работают одновременно, пользователь в чате ждёт
+ответа бота перед следующим действием.
+
+    python -m bench.load_test --chats 200 --boards 10 --rounds 3 --latency 0.05
+
+Отчёт: пропускная способность, p50/p95/p99 задержки по обработчикам и число
+обращений к API на одно действие пользователя.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder
+
+import api
+import main
+from bench.fake_keepthescore import FakeKeepTheScore
+from bench.fake_telegram import FakeTelegramRequest, UpdateFactory
+from callbacks import encode
+from history import ScoreHistory
+from ratelimit import RateLimiter
+from sessions import SessionStore
+
+UNLIMITED_RATE = 1e9
+
+
+def percentile(sorted_values, p):
+    """Процентиль p (0-100) по методу ближайшего ранга."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def chat_scenario(factory, chat_id, token, player_ids, rounds):
+    """Шаги сценария одного чата: (имя обработчика, JSON обновления)."""
+    yield 'start', factory.message(chat_id, '/start')
+    yield 'enter_token', factory.message(chat_id, token)
+    for number in range(rounds):
+        player_id = player_ids[(chat_id + number) % len(player_ids)]
+        yield 'list_players', factory.callback(chat_id, encode('list_all', 0))
+        yield 'edit_scores', factory.callback(chat_id, encode('edit_scores'))
+        yield 'player_picker_page', factory.callback(chat_id, encode('page_select_score_edit', 1))
+        yield 'select_score_edit', factory.callback(chat_id, encode('select_score_edit', player_id))
+        yield 'enter_score_change', factory.message(chat_id, '+1')
+        yield 'list_players', factory.callback(chat_id, encode('list_all', 0))
+        yield 'edit_player', factory.callback(chat_id, encode('edit_player'))
+        yield 'select_player_rename', factory.callback(chat_id, encode('select_player_rename', player_id))
+        yield 'enter_new_player_name', factory.message(chat_id, f'Игрок {chat_id}-{number}')
+        yield 'add_player', factory.callback(chat_id, encode('add_player'))
+        yield 'enter_player_name', factory.message(chat_id, f'Новичок {chat_id}-{number}')
+        yield 'board_rename', factory.callback(chat_id, encode('board_rename'))
+        yield 'enter_board_rename', factory.message(chat_id, f'Доска {token} ({number})')
+        yield 'main_menu', factory.callback(chat_id, encode('main_menu'))
+
+
+async def run(args):
+    server = FakeKeepTheScore(args.players, args.latency, args.jitter, args.error_rate)
+    api.BASE_URL = await server.start()
+    main.sessions = SessionStore()
+    main.SESSION_DB_PATH = ':memory:'
+    main.history = ScoreHistory(':memory:')
+    if not args.rate_limits:
+        # Измеряем обработчики, а не собственные ограничители частоты
+        api.rate_limiter = RateLimiter(UNLIMITED_RATE, UNLIMITED_RATE, UNLIMITED_RATE)
+        main.TELEGRAM_GLOBAL_RATE = main.TELEGRAM_CHAT_RATE = main.TELEGRAM_CHAT_BURST = UNLIMITED_RATE
+    main.BOT_TOKEN = main.BOT_TOKEN or "123456:bench"
+
+    telegram_request = FakeTelegramRequest()
+    application = main.build_application(ApplicationBuilder().request(telegram_request)
+                                         .get_updates_request(FakeTelegramRequest()))
+    await application.initialize()
+
+    factory = UpdateFactory()
+    tokens = [f"board{number}" for number in range(args.boards)]
+    player_ids = {token: list(server._board(token)["players"]) for token in tokens}
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    steps = {}  # update_id -> имя обработчика шага сценария
+
+    async def count_error(update, context):
+        # process_update не пробрасывает исключения обработчиков, а передаёт их обработчикам ошибок
+        handler = steps.get(update.update_id, 'unknown') if isinstance(update, Update) else 'unknown'
+        errors[handler] += 1
+        logging.getLogger(__name__).debug(f"Ошибка в {handler}", exc_info=context.error)
+
+    application.add_error_handler(count_error)
+
+    async def run_chat(chat_id):
+        token = tokens[chat_id % len(tokens)]
+        for handler, data in chat_scenario(factory, chat_id, token, player_ids[token], args.rounds):
+            update = Update.de_json(data, application.bot)
+            steps[update.update_id] = handler
+            started = time.perf_counter()
+            try:
+                await application.process_update(update)
+            except Exception:
+                errors[handler] += 1
+            latencies[handler].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_chat(chat_id) for chat_id in range(1, args.chats + 1)))
+    elapsed = time.perf_counter() - started
+
+    await application.shutdown()
+    await api.close_client()
+    await server.stop()
+
+    actions = sum(len(values) for values in latencies.values())
+    report = {
+        "chats": args.chats,
+        "actions": actions,
+        "elapsed": elapsed,
+        "throughput": actions / elapsed,
+        "upstream_calls": server.total_calls,
+        "upstream_calls_per_action": server.total_calls / actions,
+        "upstream_calls_by_endpoint": {f"{method} {endpoint}": count
+                                       for (method, endpoint), count in sorted(server.calls.items())},
+        "telegram_calls": sum(telegram_request.calls.values()),
+        "handlers": {},
+    }
+    for handler, values in sorted(latencies.items()):
+        values.sort()
+        report["handlers"][handler] = {
+            "count": len(values), "errors": errors[handler],
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    return report
+
+
+def print_report(report):
+    print(f"Чатов: {report['chats']}, действий: {report['actions']}, время: {report['elapsed']:.2f} с")
+    print(f"Пропускная способность: {report['throughput']:.1f} действий/с")
+    print(f"Запросов к API: {report['upstream_calls']} "
+          f"({report['upstream_calls_per_action']:.3f} на действие)")
+    for endpoint, count in report["upstream_calls_by_endpoint"].items():
+        print(f"    {endpoint}: {count}")
+    print(f"Запросов к Telegram: {report['telegram_calls']}")
+    print(f"{'обработчик':<24}{'вызовов':>8}{'ошибок':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+    for handler, stats in report["handlers"].items():
+        print(f"{handler:<24}{stats['count']:>8}{stats['errors']:>8}"
+              f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Нагрузочный тест обработчиков ScoreBot")
+    parser.add_argument('--chats', type=int, default=100, help="сколько чатов работают одновременно")
+    parser.add_argument('--boards', type=int, default=10, help="сколько разных досок у этих чатов")
+    parser.add_argument('--players', type=int, default=30, help="игроков на доске")
+    parser.add_argument('--rounds', type=int, default=3, help="сколько раз каждый чат повторяет сценарий")
+    parser.add_argument('--latency', type=float, default=0.02, help="задержка ответа API, секунды")
+    parser.add_argument('--jitter', type=float, default=0.01, help="случайная добавка к задержке API, секунды")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля ответов API с ошибкой 500")
+    parser.add_argument('--rate-limits', action='store_true', help="не отключать ограничители частоты бота")
+    parser.add_argument('--json', action='store_true', help="вывести отчёт в JSON")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
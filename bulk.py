@@ -0,0 +1,82 @@
+import asyncio
+import re
+
+from api import make_api_request
+from players import get_player_index
+
+# Сколько запросов массовой операции отправлять к API одновременно
+BULK_CONCURRENCY = 5
+# Сколько строк можно прислать за один раз
+BULK_MAX_LINES = 200
+
+# Строка массового ввода очков: «имя +5», «имя -3», «имя 10»
+SCORE_LINE = re.compile(r'^(?P<name>.+?)\s+(?P<delta>[+-]?\d+)$')
+
+
+def split_lines(text):
+    """Непустые строки сообщения без пробелов по краям."""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def parse_score_lines(lines):
+    """Разбирает строки «имя ±очки»: возвращает [(строка, имя, изменение)] и список нераспознанных строк."""
+    entries, invalid = [], []
+    for line in lines:
+        match = SCORE_LINE.match(line)
+        if match:
+            entries.append((line, match.group('name').strip(), int(match.group('delta'))))
+        else:
+            invalid.append(line)
+    return entries, invalid
+
+
+def resolve_player(players, name):
+    """Игрок по имени или ID: сначала точное совпадение, затем без учёта регистра.
+
+    Возвращает (игрок, None) или (None, причина ошибки).
+    """
+    index = get_player_index(players)
+    found = index.find(name)
+    if not found:
+        found = [player for player in index.find_prefix(name) if player['name'].casefold() == name.casefold()]
+    if not found:
+        return None, "игрок не найден"
+    if len(found) > 1:
+        return None, "несколько игроков с таким именем"
+    return found[0], None
+
+
+async def run_bounded(requests, concurrency=BULK_CONCURRENCY):
+    """Выполняет корутины одновременно, но не больше concurrency сразу; результаты — в исходном порядке."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(request):
+        async with semaphore:
+            return await request
+
+    return await asyncio.gather(*(bounded(request) for request in requests))
+
+
+async def add_players(token, names, concurrency=BULK_CONCURRENCY):
+    """Создаёт игроков по списку имён. Возвращает [(имя, успех)]."""
+    responses = await run_bounded((make_api_request('POST', 'player', token, {"name": name}) for name in names),
+                                  concurrency)
+    return [(name, bool(response)) for name, response in zip(names, responses)]
+
+
+async def apply_scores(token, players, entries, concurrency=BULK_CONCURRENCY):
+    """Применяет изменения очков [(строка, имя, изменение)]. Возвращает [(строка, ошибка или None)]."""
+    results, requests, pending = [], [], []
+    for line, name, delta in entries:
+        player, error = resolve_player(players, name)
+        results.append([line, error])
+        if player is not None:
+            pending.append(results[-1])
+            requests.append(make_api_request('POST', 'score', token,
+                                             {"player_id": player['id'], "score": delta}))
+
+    responses = await run_bounded(requests, concurrency)
+    for result, response in zip(pending, responses):
+        if not response:
+            result[1] = "ошибка API"
+    return [tuple(result) for result in results]
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class BoardCache:
+    """Ограниченный по размеру кэш данных досок с TTL и вытеснением LRU.
+
+    Методы асинхронные, чтобы у кэша в памяти и у SharedBoardCache был один интерфейс;
+    здесь они не ждут ничего и выполняются сразу.
+    """
+
+    def __init__(self, max_size=256, ttl=30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (время записи, данные доски)
+
+    async def get(self, token):
+        """Возвращает данные доски, если запись есть и ещё не устарела."""
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        stored_at, board_data = entry
+        if time.monotonic() - stored_at > self.ttl:
+            # Устаревшая запись остаётся для get_stale, пока её не вытеснят
+            return None
+        self._entries.move_to_end(token)
+        return board_data
+
+    async def get_stale(self, token):
+        """Возвращает последние известные данные доски независимо от их возраста."""
+        entry = self._entries.get(token)
+        return entry[1] if entry is not None else None
+
+    async def set(self, token, board_data):
+        """Сохраняет данные доски, вытесняя самые давно использованные записи."""
+        self._entries[token] = (time.monotonic(), board_data)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def update(self, token, transform):
+        """Заменяет данные записи на transform(данные), не продлевая её срок жизни.
+
+        Если записи нет, она устарела или transform вернул None, запись удаляется.
+        """
+        entry = self._entries.get(token)
+        board_data = None
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+            board_data = transform(entry[1])
+        if board_data is None:
+            self._entries.pop(token, None)
+        else:
+            self._entries[token] = (entry[0], board_data)
+
+    async def invalidate(self, token):
+        """Удаляет запись доски из кэша."""
+        self._entries.pop(token, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedBoardCache:
+    """Кэш досок в общем хранилище (shared.SQLiteStore или RedisStore) для нескольких процессов.
+
+    Копии в памяти процесса нет: доску, полученную или изменённую одним процессом,
+    остальные сразу видят в хранилище и не запрашивают у API. Обращение к хранилищу
+    может ждать блокировку записи другого процесса, поэтому выполняется в отдельном
+    потоке и не останавливает цикл событий.
+    """
+
+    def __init__(self, store, max_size=256, ttl=30.0):
+        self.store = store
+        self.max_size = max_size
+        self.ttl = ttl
+        self._size = 0  # Записей в хранилище после последней записи этого процесса
+
+    async def get(self, token):
+        entry = await asyncio.to_thread(self.store.get, token)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    async def get_stale(self, token):
+        entry = await asyncio.to_thread(self.store.get, token)
+        return entry[1] if entry is not None else None
+
+    def _set(self, token, board_data):
+        self.store.set(token, board_data)
+        return self.store.prune(self.max_size)
+
+    async def set(self, token, board_data):
+        size = await asyncio.to_thread(self._set, token, board_data)
+        if size is not None:
+            self._size = size
+
+    async def update(self, token, transform):
+        def apply(entry):
+            if entry is None or time.time() - entry[0] > self.ttl:
+                return None
+            return transform(entry[1])
+
+        await asyncio.to_thread(self.store.update, token, apply)
+
+    async def invalidate(self, token):
+        await asyncio.to_thread(self.store.delete, token)
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,132 @@
+"""Компактный формат callback_data кнопок и маршрутизация нажатий по нему.
+
+callback_data = версия (1 символ) + код действия (1 символ) + аргументы
+фиксированной ширины в base36. Например, кнопка игрока 12345 в окне удаления —
+"1f000009ix". Разбор — срез строки и поиск в словаре, без регулярных выражений.
+
+Коды действий — позиция в ACTIONS, поэтому новые действия добавляются только
+в конец списка; при несовместимом изменении формата нужно увеличить VERSION.
+Кнопки старого формата (или другой версии) распознаются как устаревшие.
+"""
+from collections import namedtuple
+
+from telegram import Update
+from telegram.ext import BaseHandler
+
+VERSION = '1'
+CODE_ALPHABET = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+# Ширина аргументов в символах base36
+FIELD_WIDTHS = {
+    'page': 2,  # номер страницы, до 1295
+    'index': 2,  # номер доски в списке чата
+    'id': 8,  # ID игрока, до 36**8 ≈ 2.8·10^12
+}
+
+# (действие, аргументы). Только дописывать в конец: код действия — его позиция
+ACTIONS = (
+    ('main_menu', ()),
+    ('list_all', ('page',)),
+    ('list_top', ('page',)),
+    ('add_player', ()),
+    ('edit_player', ()),
+    ('delete_player', ()),
+    ('edit_scores', ()),
+    ('board_rename', ()),
+    ('reset_all', ()),
+    ('bulk_scores', ()),
+    ('boards', ()),
+    ('switch_board', ('index',)),
+    ('add_board', ()),
+    ('aggregate_top', ()),
+    ('select_player_rename', ('id',)),
+    ('confirm_delete', ('id',)),
+    ('select_score_edit', ('id',)),
+    ('page_select_player_rename', ('page',)),
+    ('page_confirm_delete', ('page',)),
+    ('page_select_score_edit', ('page',)),
+    ('delete_player_confirmed', ()),
+    ('confirm_reset', ()),
+)
+
+Callback = namedtuple('Callback', 'action args')
+
+_codes = {action: CODE_ALPHABET[position] for position, (action, _) in enumerate(ACTIONS)}
+_actions = {CODE_ALPHABET[position]: (action, tuple(FIELD_WIDTHS[field] for field in fields))
+            for position, (action, fields) in enumerate(ACTIONS)}
+_widths = {action: widths for action, widths in _actions.values()}
+
+
+def _base36(value, width):
+    value = int(value)
+    if value < 0 or value >= 36 ** width:
+        raise ValueError(f"Значение {value} не помещается в {width} символов base36")
+    digits = []
+    for _ in range(width):
+        value, digit = divmod(value, 36)
+        digits.append(DIGITS[digit])
+    return ''.join(reversed(digits))
+
+
+def encode(action, *args):
+    """callback_data для действия с аргументами (целыми числами)."""
+    widths = _widths[action]
+    if len(args) != len(widths):
+        raise ValueError(f"Действию {action} нужно аргументов: {len(widths)}")
+    return VERSION + _codes[action] + ''.join(_base36(arg, width) for arg, width in zip(args, widths))
+
+
+def decode(data):
+    """Callback(действие, аргументы) или None, если данные в другом формате или версии."""
+    if len(data) < 2 or data[0] != VERSION:
+        return None
+    entry = _actions.get(data[1])
+    if entry is None:
+        return None
+    action, widths = entry
+    if len(data) != 2 + sum(widths) or not (data.isascii() and data.isalnum()):
+        return None
+    args, position = [], 2
+    for width in widths:
+        args.append(int(data[position:position + width], 36))
+        position += width
+    return Callback(action, tuple(args))
+
+
+class CallbackRouter(BaseHandler):
+    """Обработчик всех нажатий в одном состоянии диалога.
+
+    routes — словарь действие -> обработчик; нужный обработчик находится по
+    разобранному callback_data за O(1). Аргументы кнопки передаются в context.args.
+    """
+
+    def __init__(self, routes, block=True):
+        super().__init__(self._route, block=block)
+        self.routes = dict(routes)
+
+    def check_update(self, update):
+        if not isinstance(update, Update) or update.callback_query is None:
+            return None
+        data = update.callback_query.data
+        if not isinstance(data, str):
+            return None
+        callback = decode(data)
+        if callback is None or callback.action not in self.routes:
+            return None
+        return callback
+
+    def collect_additional_context(self, context, update, application, check_result):
+        context.args = list(check_result.args)
+        context.callback_action = check_result.action
+
+    async def _route(self, update, context):
+        return await self.routes[context.callback_action](update, context)
+
+
+class StaleCallbackHandler(BaseHandler):
+    """Ловит нажатия кнопок, callback_data которых не разбирается (старый формат или версия)."""
+
+    def check_update(self, update):
+        return (isinstance(update, Update) and update.callback_query is not None
+                and isinstance(update.callback_query.data, str) and decode(update.callback_query.data) is None)
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitBreaker:
+    """Размыкатель цепи для внешнего сервиса.
+
+    После failure_threshold ошибок подряд цепь размыкается, и запросы сразу
+    отклоняются, не дожидаясь таймаутов. Пока цепь разомкнута, фоновая задача раз
+    в reset_timeout секунд вызывает probe(); первая удачная проверка замыкает цепь.
+    Без probe через reset_timeout пропускается один пробный запрос (полуоткрытое
+    состояние): его успех замыкает цепь, ошибка снова размыкает.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=15.0, probe=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe = probe  # async () -> bool, проверка доступности сервиса
+        self.state = CLOSED
+        self.opened_at = None
+        self._failures = 0
+        self._probe_task = None
+
+    @property
+    def is_open(self):
+        return self.state != CLOSED
+
+    def allow_request(self):
+        """Можно ли отправлять запрос прямо сейчас."""
+        if self.state == CLOSED:
+            return True
+        if self.probe is None and time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Без фоновой проверки пробным запросом служит первый запрос после паузы. Пока он
+            # выполняется, остальные отклоняются; если его результат так и не записан
+            # (запрос отменён), через reset_timeout пропускается следующий
+            self.state = HALF_OPEN
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logger.info("Сервис снова доступен, цепь замкнута")
+        self.state = CLOSED
+        self._failures = 0
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self._failures >= self.failure_threshold):
+            self._open()
+
+    def _open(self):
+        logger.warning(f"Сервис недоступен ({self._failures} ошибок подряд), цепь разомкнута")
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        if self.probe is not None and (self._probe_task is None or self._probe_task.done()):
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_until_recovered())
+
+    async def _probe_until_recovered(self):
+        while self.state != CLOSED:
+            await asyncio.sleep(self.reset_timeout)
+            try:
+                recovered = await self.probe()
+            except Exception as e:
+                logger.warning(f"Ошибка при проверке доступности сервиса: {e}")
+                recovered = False
+            if recovered:
+                self.record_success()
+
+    async def close(self):
+        """Останавливает фоновую проверку."""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
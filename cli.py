@@ -0,0 +1,259 @@
+"""Пакетные операции с досками keepthescore из командной строки, без Telegram.
+
+Операции читаются из файла JSON Lines или CSV (или из stdin), выполняются
+одновременно и построчно пишутся в stdout в виде JSON Lines; ход работы — в stderr.
+
+    python cli.py scores.csv --token <токен доски>
+    echo '{"op": "reset", "token": "..."}' | python cli.py
+
+Операции (поле op) и их поля:
+    add_player     name
+    score          player (имя или ID), delta
+    rename_player  player, name
+    delete_player  player
+    rename_board   title
+    reset
+    board          — выводит данные доски
+Токен доски берётся из поля token или из --token.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+
+import api
+from api import close_client, get_board_data, make_api_request
+from bulk import BULK_CONCURRENCY, resolve_player
+
+PROGRESS_INTERVAL = 1.0  # Как часто печатать ход работы в stderr, секунды
+
+
+class OperationError(Exception):
+    """Операцию нельзя выполнить: неверные поля, игрок не найден, ошибка API."""
+
+
+def require(op, field):
+    value = op.get(field)
+    if value is None or value == '':
+        raise OperationError(f"не задано поле {field}")
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise OperationError(f"поле {field} должно быть строкой или целым числом")
+    return value
+
+
+async def find_player(token, op):
+    board_data = await get_board_data(token)
+    if not board_data or not isinstance(board_data.get('players'), list):
+        raise OperationError("не удалось получить данные доски")
+    player, error = resolve_player(board_data['players'], str(require(op, 'player')))
+    if player is None:
+        raise OperationError(error)
+    return player
+
+
+async def call_api(method, endpoint, token, payload=None):
+    response = await make_api_request(method, endpoint, token, payload)
+    if not response:
+        raise OperationError("ошибка API")
+    return response
+
+
+async def add_player(token, op):
+    return await call_api('POST', 'player', token, {"name": require(op, 'name')})
+
+
+async def score(token, op):
+    try:
+        delta = int(require(op, 'delta'))
+    except ValueError:
+        raise OperationError("delta должно быть целым числом")
+    player = await find_player(token, op)
+    return await call_api('POST', 'score', token, {"player_id": player['id'], "score": delta})
+
+
+async def rename_player(token, op):
+    name = require(op, 'name')
+    player = await find_player(token, op)
+    return await call_api('PATCH', f"player/{player['id']}", token, {"name": name})
+
+
+async def delete_player(token, op):
+    player = await find_player(token, op)
+    return await call_api('DELETE', f"player/{player['id']}", token)
+
+
+async def rename_board(token, op):
+    title = require(op, 'title')
+    board_data = await get_board_data(token)
+    if not board_data or 'board' not in board_data:
+        raise OperationError("не удалось получить данные доски")
+    appearance = board_data['board']['appearance']
+    payload = {key: appearance[key] for key in ('theme', 'layout', 'sorting', 'score_format', 'goal_value')}
+    payload['title'] = title
+    return await call_api('PUT', 'board', token, payload)
+
+
+async def reset(token, op):
+    return await call_api('POST', 'board/reset-scores', token)
+
+
+async def board(token, op):
+    board_data = await get_board_data(token)
+    if not board_data:
+        raise OperationError("не удалось получить данные доски")
+    return board_data
+
+
+OPERATIONS = {
+    'add_player': add_player,
+    'score': score,
+    'rename_player': rename_player,
+    'delete_player': delete_player,
+    'rename_board': rename_board,
+    'reset': reset,
+    'board': board,
+}
+
+
+def read_operations(stream, fmt):
+    """Операции из потока по одной: (номер строки, операция или None, ошибка разбора)."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if value not in ('', None)}, None
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            op = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield number, None, f"неверный JSON: {e}"
+            continue
+        if not isinstance(op, dict):
+            yield number, None, "строка должна быть JSON-объектом"
+            continue
+        yield number, op, None
+
+
+async def run_operation(number, op, default_token):
+    """Выполняет операцию; любая ошибка превращается в результат с ok = false."""
+    result = {'line': number, 'op': op.get('op'), 'ok': False}
+    try:
+        name = op.get('op')
+        handler = OPERATIONS.get(name) if isinstance(name, str) else None
+        if handler is None:
+            raise OperationError(f"неизвестная операция {name!r}")
+        token = op.get('token') or default_token
+        if not isinstance(token, str) or not token:
+            raise OperationError("не задан токен доски")
+        response = await handler(token, op)
+        result['ok'] = True
+        if isinstance(response, dict):
+            result['result'] = response
+    except OperationError as e:
+        result['error'] = str(e)
+    except Exception as e:
+        result['error'] = f"внутренняя ошибка: {e!r}"
+    return result
+
+
+class Progress:
+    """Счётчики хода работы, которые периодически печатаются в stderr."""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.started = time.monotonic()
+        self.done = 0
+        self.failed = 0
+
+    def report(self, final=False):
+        if not self.enabled:
+            return
+        elapsed = time.monotonic() - self.started
+        print(f"\rВыполнено: {self.done}, ошибок: {self.failed}, {elapsed:.1f} с", end='\n' if final else '',
+              file=sys.stderr, flush=True)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(PROGRESS_INTERVAL)
+            self.report()
+
+
+async def run(args, stream, out=sys.stdout):
+    """Выполняет операции из потока, не больше args.concurrency одновременно. Возвращает число ошибок."""
+    semaphore = asyncio.Semaphore(args.concurrency)
+    progress = Progress(not args.quiet)
+    reporter = asyncio.create_task(progress.run())
+    tasks = set()
+
+    async def execute(number, op, error):
+        # На каждую строку входа пишется ровно один результат, даже при неожиданной ошибке
+        result = {'line': number, 'op': None, 'ok': False, 'error': error}
+        try:
+            if error is None:
+                result = await run_operation(number, op, args.token)
+        except Exception as e:
+            result['error'] = f"внутренняя ошибка: {e!r}"
+        finally:
+            semaphore.release()
+        progress.done += 1
+        progress.failed += not result['ok']
+        out.write(json.dumps(result, ensure_ascii=False) + '\n')
+        out.flush()
+
+    try:
+        operations = read_operations(stream, args.format)
+        while True:
+            # Следующая операция читается, только когда освободилось место: файл не грузится в память целиком
+            await semaphore.acquire()
+            item = await asyncio.to_thread(next, operations, None)
+            if item is None:
+                semaphore.release()
+                break
+            task = asyncio.create_task(execute(*item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        reporter.cancel()
+        progress.report(final=True)
+        await close_client()
+    return progress.failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетные операции с досками keepthescore.com",
+                                     epilog="Список операций и их полей — в начале cli.py.")
+    parser.add_argument('file', nargs='?', default='-', help="файл с операциями (по умолчанию stdin)")
+    parser.add_argument('--format', choices=('jsonl', 'csv'),
+                        help="формат операций (по умолчанию по расширению файла, для stdin — jsonl)")
+    parser.add_argument('--token', help="токен доски для операций без поля token")
+    parser.add_argument('--concurrency', type=int, default=BULK_CONCURRENCY,
+                        help="сколько операций выполнять одновременно")
+    parser.add_argument('--quiet', action='store_true', help="не печатать ход работы в stderr")
+    parser.add_argument('--api-url', default=api.BASE_URL, help="адрес API keepthescore")
+    args = parser.parse_args(argv)
+    if args.format is None:
+        args.format = 'csv' if args.file.lower().endswith('.csv') else 'jsonl'
+    if args.concurrency < 1:
+        parser.error("--concurrency должно быть не меньше 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    api.BASE_URL = args.api_url
+    if args.file == '-':
+        failed = asyncio.run(run(args, sys.stdin))
+    else:
+        with open(args.file, encoding='utf-8', newline='') as stream:
+            failed = asyncio.run(run(args, stream))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+class ScoreHistory:
+    """История очков в SQLite, только дописываемая.
+
+    Из каждого снимка доски записываются лишь игроки, чьи очки изменились с
+    прошлой записи, поэтому неизменная доска места не занимает. Раз в
+    compact_interval секунд записи старше compact_after сжимаются до одной на
+    игрока в день, а записи старше retention (если задан) удаляются. Запросы по
+    диапазону времени идут по индексам (token, ts) и (token, player_id, ts) и к
+    API не обращаются.
+    """
+
+    def __init__(self, path, compact_after=7 * DAY, compact_interval=3600.0, retention=None, max_boards=1024):
+        self.path = path
+        self.compact_after = compact_after
+        self.compact_interval = compact_interval
+        self.retention = retention
+        self.max_boards = max_boards
+        self._db = None
+        # token -> {player_id: [очки, имя]} — последнее записанное состояние доски
+        self._last = OrderedDict()
+        self._compacted_at = time.monotonic()
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS score_history "
+                             "(token TEXT NOT NULL, player_id TEXT NOT NULL, ts REAL NOT NULL, score INTEGER NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS score_history_token_ts ON score_history (token, ts)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS score_history_player_ts "
+                             "ON score_history (token, player_id, ts)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS player_names "
+                             "(token TEXT NOT NULL, player_id TEXT NOT NULL, name TEXT NOT NULL, "
+                             "PRIMARY KEY (token, player_id))")
+        return self._db
+
+    def _state(self, token):
+        """Последнее записанное состояние доски; при первом обращении читается из базы."""
+        state = self._last.get(token)
+        if state is not None:
+            self._last.move_to_end(token)
+            return state
+
+        db = self._connect()
+        names = dict(db.execute("SELECT player_id, name FROM player_names WHERE token = ?", (token,)))
+        state = {player_id: [score, names.get(player_id)] for player_id, score, _ in db.execute(
+            "SELECT player_id, score, MAX(ts) FROM score_history WHERE token = ? GROUP BY player_id", (token,))}
+        self._last[token] = state
+        while len(self._last) > self.max_boards:
+            self._last.popitem(last=False)
+        return state
+
+    def _append(self, token, changes, renames, ts):
+        db = self._connect()
+        with db:
+            if changes:
+                db.executemany("INSERT INTO score_history (token, player_id, ts, score) VALUES (?, ?, ?, ?)",
+                               [(token, player_id, ts, score) for player_id, score in changes])
+            if renames:
+                db.executemany("INSERT OR REPLACE INTO player_names (token, player_id, name) VALUES (?, ?, ?)",
+                               [(token, player_id, name) for player_id, name in renames])
+
+    def record_board(self, token, board_data, ts=None):
+        """Записывает снимок доски (слушатель api.board_listeners)."""
+        players = board_data.get('players')
+        if not isinstance(players, list):
+            return
+        state = self._state(token)
+        changes, renames = [], []
+        for player in players:
+            player_id = str(player['id'])
+            entry = state.get(player_id)
+            if entry is None:
+                entry = state[player_id] = [None, None]
+            if entry[0] != player['score']:
+                entry[0] = player['score']
+                changes.append((player_id, player['score']))
+            if entry[1] != player['name']:
+                entry[1] = player['name']
+                renames.append((player_id, player['name']))
+        if changes or renames:
+            self._append(token, changes, renames, time.time() if ts is None else ts)
+        self.maybe_compact()
+
+    def record_write(self, token, method, endpoint, payload, result):
+        """Записывает изменение очков или имени, прошедшее через API (слушатель api.write_listeners)."""
+        state = self._state(token)
+        if method == 'POST' and endpoint == 'score' and payload:
+            player_id = str(payload['player_id'])
+            entry = state.get(player_id)
+            if isinstance(result, dict) and isinstance(result.get('score'), int):
+                score = result['score']
+            elif entry is not None and entry[0] is not None:
+                score = entry[0] + payload['score']
+            else:
+                return  # Текущие очки неизвестны: изменение попадёт в историю со следующим снимком
+            if entry is None:
+                entry = state[player_id] = [None, None]
+            entry[0] = score
+            self._append(token, [(player_id, score)], [], time.time())
+        elif method == 'PATCH' and endpoint.startswith('player/') and payload and 'name' in payload:
+            player_id = endpoint.split('/', 1)[1]
+            state.setdefault(player_id, [None, None])[1] = payload['name']
+            self._append(token, [], [(player_id, payload['name'])], time.time())
+
+    def maybe_compact(self):
+        if time.monotonic() - self._compacted_at >= self.compact_interval:
+            self._compacted_at = time.monotonic()
+            self.compact()
+
+    def compact(self, now=None):
+        """Сжимает старые записи до последней на игрока в день и удаляет записи старше retention."""
+        now = time.time() if now is None else now
+        cutoff = now - self.compact_after
+        db = self._connect()
+        with db:
+            if self.retention is not None:
+                db.execute("DELETE FROM score_history WHERE ts < ?", (now - self.retention,))
+            removed = db.execute(
+                "DELETE FROM score_history WHERE ts < ? AND rowid NOT IN ("
+                "SELECT rowid FROM (SELECT rowid, MAX(ts) FROM score_history WHERE ts < ? "
+                f"GROUP BY token, player_id, CAST(ts / {DAY} AS INTEGER)))", (cutoff, cutoff)).rowcount
+        if removed:
+            logger.info(f"История очков сжата: удалено записей {removed}")
+
+    def find_players(self, token, name):
+        """Игроки доски из истории с таким ID или именем (без учёта регистра): [(player_id, имя)]."""
+        state = self._state(token)
+        if name in state:
+            return [(name, state[name][1])]
+        name = name.casefold()
+        return [(player_id, entry[1]) for player_id, entry in state.items()
+                if entry[1] is not None and entry[1].casefold() == name]
+
+    def trend(self, token, player_id, since, until=None):
+        """Очки игрока за период: последнее значение до since и все изменения после, [(ts, очки)]."""
+        until = time.time() if until is None else until
+        db = self._connect()
+        before = db.execute("SELECT ts, score FROM score_history WHERE token = ? AND player_id = ? AND ts <= ? "
+                            "ORDER BY ts DESC LIMIT 1", (token, player_id, since)).fetchall()
+        points = db.execute("SELECT ts, score FROM score_history WHERE token = ? AND player_id = ? "
+                            "AND ts > ? AND ts <= ? ORDER BY ts", (token, player_id, since, until)).fetchall()
+        return before + points
+
+    def movers(self, token, since, until=None, limit=10):
+        """Игроки с наибольшим по модулю изменением очков за период: [(имя, очки в начале, очки в конце, изменение)].
+
+        Для игроков, появившихся в истории позже since, начало — первая запись за период.
+        """
+        until = time.time() if until is None else until
+        db = self._connect()
+        end = {player_id: score for player_id, score, _ in db.execute(
+            "SELECT player_id, score, MAX(ts) FROM score_history WHERE token = ? AND ts > ? AND ts <= ? "
+            "GROUP BY player_id", (token, since, until))}
+        if not end:
+            return []
+        start = {player_id: score for player_id, score, _ in db.execute(
+            "SELECT player_id, score, MIN(ts) FROM score_history WHERE token = ? AND ts > ? AND ts <= ? "
+            "GROUP BY player_id", (token, since, until))}
+        start.update((player_id, score) for player_id, score, _ in db.execute(
+            "SELECT player_id, score, MAX(ts) FROM score_history WHERE token = ? AND ts <= ? GROUP BY player_id",
+            (token, since)))
+
+        state = self._state(token)
+        result = []
+        for player_id, score in end.items():
+            gain = score - start[player_id]
+            if gain:
+                name = state.get(player_id, [None, None])[1] or player_id
+                result.append((name, start[player_id], score, gain))
+        # По модулю изменения: игроки, потерявшие много очков, тоже в списке
+        result.sort(key=lambda row: abs(row[3]), reverse=True)
+        return result[:limit]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def daily_scores(points, since, days):
+    """Очки на конец каждого из days дней начиная с since по точкам [(ts, очки)]."""
+    result, position, score = [], 0, None
+    for day in range(days):
+        day_end = since + (day + 1) * DAY
+        while position < len(points) and points[position][0] <= day_end:
+            score = points[position][1]
+            position += 1
+        result.append((day_end, score))
+    return result
+
+
+def sparkline(values):
+    """Мини-график из символов ▁…█."""
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    return ''.join(SPARK_CHARS[(value - low) * (len(SPARK_CHARS) - 1) // span] for value in values)
+
+
+def render_trend(name, points, since, days):
+    """Текст динамики очков игрока по дням."""
+    daily = [(day_end, score) for day_end, score in daily_scores(points, since, days) if score is not None]
+    if not daily:
+        return f"Нет истории очков игрока {name} за {days} дн."
+
+    lines = [f"Динамика очков: {name} за {days} дн.", sparkline([score for _, score in daily])]
+    previous = None
+    for day_end, score in daily:
+        change = f" ({score - previous:+d})" if previous is not None and score != previous else ""
+        lines.append(f"{datetime.fromtimestamp(day_end - 1).strftime('%d.%m')}: {score}{change}")
+        previous = score
+    return "\n".join(lines)
+
+
+def render_movers(movers, days):
+    """Текст списка игроков с наибольшим изменением очков."""
+    if not movers:
+        return f"За {days} дн. очки никого не изменились (или история ещё не накоплена)."
+    lines = [f"Больше всего изменились очки за {days} дн.:"]
+    lines += [f"{name}: {gain:+d} ({start} → {end})" for name, start, end, gain in movers]
+    return "\n".join(lines)
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from callbacks import encode
+
+PLAYERS_PER_PAGE = 10  # Игроков на одной странице клавиатуры выбора
+KEYBOARD_CACHE_SIZE = 512  # Сколько готовых клавиатур держать в памяти
+
+# Неизменные клавиатуры строятся один раз при импорте и переиспользуются
+CANCEL_BUTTON = InlineKeyboardButton("Отмена", callback_data=encode('main_menu'))
+MAIN_MENU_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Список игроков", callback_data=encode('list_all', 0)),
+     InlineKeyboardButton("Добавить игрока", callback_data=encode('add_player'))],
+    [InlineKeyboardButton("Редактировать игрока", callback_data=encode('edit_player')),
+     InlineKeyboardButton("Редактировать очки", callback_data=encode('edit_scores'))],
+    [InlineKeyboardButton("Переименовать доску", callback_data=encode('board_rename')),
+     InlineKeyboardButton("Сбросить очки", callback_data=encode('reset_all'))],
+    [InlineKeyboardButton("Удалить игрока", callback_data=encode('delete_player')),
+     InlineKeyboardButton("Очки списком", callback_data=encode('bulk_scores'))],
+    [InlineKeyboardButton("Доски", callback_data=encode('boards'))],
+])
+CONFIRM_DELETE_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Удалить", callback_data=encode('delete_player_confirmed')), CANCEL_BUTTON]
+])
+CONFIRM_RESET_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Сбросить все очки", callback_data=encode('confirm_reset')), CANCEL_BUTTON]
+])
+AGGREGATE_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Доски", callback_data=encode('boards')),
+     InlineKeyboardButton("Главное меню", callback_data=encode('main_menu'))]
+])
+
+# (id(players), action, page) -> (players, InlineKeyboardMarkup)
+_keyboards = OrderedDict()
+
+
+def page_count(players):
+    """Количество страниц клавиатуры выбора игрока."""
+    return max(1, -(-len(players) // PLAYERS_PER_PAGE))
+
+
+def player_keyboard(players, action, page=0):
+    """Страница клавиатуры выбора игрока с кнопками листания.
+
+    Кнопки игроков несут действие action с ID игрока, кнопки листания — действие
+    f"page_{action}" с номером страницы (см. callbacks). Готовые клавиатуры
+    переиспользуются, пока список игроков (версия доски) не изменился.
+    """
+    page = min(max(page, 0), page_count(players) - 1)
+    key = (id(players), action, page)
+    cached = _keyboards.get(key)
+    if cached is not None and cached[0] is players:
+        _keyboards.move_to_end(key)
+        return cached[1]
+
+    start = page * PLAYERS_PER_PAGE
+    markup = _build_keyboard(players[start:start + PLAYERS_PER_PAGE], action, page, page_count(players))
+    _keyboards[key] = (players, markup)
+    while len(_keyboards) > KEYBOARD_CACHE_SIZE:
+        _keyboards.popitem(last=False)
+    return markup
+
+
+def search_keyboard(players, action):
+    """Клавиатура с результатами поиска игрока (без листания)."""
+    return _build_keyboard(players, action, 0, 1)
+
+
+def _build_keyboard(players, action, page, pages):
+    keyboard = [[InlineKeyboardButton(player['name'], callback_data=encode(action, player['id']))]
+                for player in players]
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(f"◀️ {page}/{pages}", callback_data=encode(f"page_{action}", page - 1)))
+    if page < pages - 1:
+        navigation.append(InlineKeyboardButton(f"{page + 2}/{pages} ▶️",
+                                               callback_data=encode(f"page_{action}", page + 1)))
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append([CANCEL_BUTTON])
+    return InlineKeyboardMarkup(keyboard)
@@ -1,9 +1,26 @@
-import json
-import requests
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from telegram.ext import (ApplicationBuilder, CallbackQueryHandler, CommandHandler, ContextTypes, ConversationHandler,
-                          MessageHandler, filters)
+from telegram.error import TelegramError
+from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, ConversationHandler, MessageHandler, filters
+import asyncio
+import functools
 import logging
+import time
+
+import api
+from api import close_client, get_board_data, is_stale, make_api_request
+from batching import ScoreBatcher
+from callbacks import CallbackRouter, StaleCallbackHandler, encode
+from bulk import BULK_MAX_LINES, add_players, apply_scores, parse_score_lines, split_lines
+from history import DAY, ScoreHistory, render_movers, render_trend
+from keyboards import (AGGREGATE_KEYBOARD, CONFIRM_DELETE_KEYBOARD, CONFIRM_RESET_KEYBOARD, MAIN_MENU_KEYBOARD,
+                       PLAYERS_PER_PAGE, player_keyboard, search_keyboard)
+from metrics import Gauge, start_metrics_server, traced
+from persistence import SQLitePersistence
+from players import get_player_index, paginate_lines, render_aggregate, render_player_pages
+from processing import ChatOrderedUpdateProcessor
+from sessions import SQLiteSessionStore
+from telegram_rate import TelegramRateLimiter
+from watch import WatchManager
 
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
                     level=logging.INFO)
@@ -11,50 +28,113 @@ logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s
 logger = logging.getLogger(__name__)
 
 
-# КОНСТАНТЫ
-BASE_URL = "https://keepthescore.com/api"
-HEADERS = {
-    'Content-Type': 'application/json',
-    'accept': '*/*'
-}
-
 # States для ConversationHandler
 (ENTER_TOKEN, MAIN_MENU, ENTER_PLAYER_NAME, SELECT_PLAYER_RENAME, ENTER_NEW_PLAYER_NAME, SELECT_PLAYER_DELETE,
- CONFIRM_DELETE, ENTER_SCORE_CHANGE, SELECT_PLAYER_SCORE, ENTER_BOARD_RENAME) = range(10)
+ CONFIRM_DELETE, ENTER_SCORE_CHANGE, SELECT_PLAYER_SCORE, ENTER_BOARD_RENAME, ENTER_BULK_SCORES) = range(11)
+
+# Окна выбора игрока: действие кнопки игрока (см. callbacks) -> (заголовок, состояние)
+PLAYER_PICKERS = {
+    "select_player_rename": ("Выберите игрока для переименования:", SELECT_PLAYER_RENAME),
+    "confirm_delete": ("Выберите игрока для удаления:", SELECT_PLAYER_DELETE),
+    "select_score_edit": ("Выберите игрока, чтобы изменить очки:", SELECT_PLAYER_SCORE),
+}
+
+TOP_PLAYERS = 10  # Размер списка «Топ» в просмотре игроков
+MAX_BOARDS_PER_CHAT = 20  # Сколько досок можно сохранить в одном чате
 
 BOT_TOKEN = ""  # ТОКЕН БОТА
 
-# Глобальный словарь для хранения данных пользователя
-user_data = {}
+# Режим получения обновлений: "polling" (по умолчанию), "webhook" или "workers"
+# (long polling и несколько рабочих процессов, см. workers.py)
+RUN_MODE = "polling"
+# Настройки webhook (нужен python-telegram-bot[webhooks])
+WEBHOOK_LISTEN = "0.0.0.0"  # Адрес встроенного HTTP-сервера
+WEBHOOK_PORT = 8443
+WEBHOOK_PATH = "telegram"  # Путь, на который Telegram (или балансировщик) присылает обновления
+WEBHOOK_URL = ""  # Публичный адрес webhook, например https://bot.example.com/telegram
+WEBHOOK_SECRET = ""  # Секретный токен, который Telegram передаёт в каждом запросе
+WEBHOOK_MAX_CONNECTIONS = 40  # Сколько одновременных соединений Telegram может открыть (1-100)
 
+# Сколько обновлений обрабатывать одновременно (обновления одного чата всегда идут по очереди)
+CONCURRENT_UPDATES = 64
+
+# Ограничения исходящих запросов к Telegram
+TELEGRAM_GLOBAL_RATE = 30.0  # Запросов в секунду от бота в целом
+TELEGRAM_CHAT_RATE = 1.0  # Запросов в секунду в один чат
+TELEGRAM_CHAT_BURST = 3  # Сколько запросов в один чат можно отправить подряд без ожидания
+
+# Пакетная отправка изменений очков: изменения одного игрока за окно суммируются в один запрос
+SCORE_BATCH_ENABLED = False
+SCORE_BATCH_WINDOW = 2.0  # Окно накопления, секунды
+
+# Сессии чатов (токен доски) и состояния диалогов хранятся в SQLite и переживают перезапуск
+SESSION_DB_PATH = "scorebot.sqlite3"
+SESSION_MAX_IDLE = 3600.0  # Через сколько секунд простоя выгружать сессию чата из памяти
+SESSION_MAX_ACTIVE = 10000  # Сколько сессий держать в памяти одновременно
+
+sessions = None  # создаётся в build_application()
+
+# Эндпоинт метрик Prometheus (http://METRICS_HOST:METRICS_PORT/metrics); None — выключен
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = None
+
+metrics_server = None
+# Метрики бота создаются в build_application(): в режиме workers процесс, запущенный через spawn,
+# выполняет main.py ещё раз как __mp_main__, и метрики на уровне модуля регистрировались бы дважды
+sessions_gauge = active_chats_gauge = user_data_gauge = watched_boards_gauge = None
+
+# Накопитель изменений очков (создаётся в build_application(), если включён SCORE_BATCH_ENABLED)
+score_batcher = None
+
+# Живая таблица (/watch): доска опрашивается раз в WATCH_MIN_INTERVAL секунд, пока она меняется,
+# и всё реже (до WATCH_MAX_INTERVAL), пока изменений нет
+WATCH_MIN_INTERVAL = 5.0
+WATCH_MAX_INTERVAL = 60.0
+
+watch_manager = None  # создаётся в build_application()
+
+# История очков: каждый полученный снимок доски и каждое изменение очков через бота
+HISTORY_DB_PATH = SESSION_DB_PATH
+HISTORY_COMPACT_AFTER = 7 * DAY  # Записи старше этого сжимаются до одной на игрока в день
+HISTORY_RETENTION = None  # Через сколько секунд удалять записи (None — хранить всегда)
+TREND_DAYS = 7  # Период /trend и /movers по умолчанию, дни
+MOVERS_LIMIT = 10  # Сколько игроков показывать в /movers
+
+history = None  # создаётся в build_application()
+
+
+def create_gauges():
+    """Регистрирует метрики бота (один раз на процесс)."""
+    global sessions_gauge, active_chats_gauge, user_data_gauge, watched_boards_gauge
+    if sessions_gauge is not None:
+        return
+    sessions_gauge = Gauge('scorebot_sessions_loaded', "Сессии чатов, загруженные в память",
+                           function=lambda: len(sessions) if sessions is not None else 0)
+    active_chats_gauge = Gauge('scorebot_active_chats', "Чаты с обрабатываемыми или ожидающими обновлениями")
+    user_data_gauge = Gauge('scorebot_user_data_entries', "Пользователи с сохранённым состоянием диалога")
+    watched_boards_gauge = Gauge('scorebot_watched_boards', "Доски с подписчиками живой таблицы",
+                                 function=lambda: len(watch_manager.watchers) if watch_manager else 0)
 
-def make_api_request(method, endpoint, token, payload=None):
-    """Универсальная функция для выполнения API-запросов."""
-    url = f"{BASE_URL}/{token}/{endpoint}"
-    try:
-        if method == 'GET':
-            response = requests.get(url, headers=HEADERS)
-        elif method == 'POST':
-            response = requests.post(url, data=json.dumps(payload), headers=HEADERS)
-        elif method == 'PUT':
-            response = requests.put(url, data=json.dumps(payload), headers=HEADERS)
-        elif method == 'PATCH':
-            response = requests.patch(url, data=json.dumps(payload), headers=HEADERS)
-        elif method == 'DELETE':
-            response = requests.delete(url, headers=HEADERS)
-        else:
-            raise ValueError(f"Неизвестный HTTP метод: {method}")
 
-        response.raise_for_status()
-        return response.json() if response.text else {}
-    except requests.exceptions.RequestException as e:
-        print(f"Ошибка API: {e}")
-        return None
+def get_token(chat_id):
+    """Токен активной доски чата или None."""
+    session = sessions.get(chat_id)
+    return session['token'] if session else None
 
 
-def get_board_data(token):
-    """Получение данных доски по токену."""
-    return make_api_request('GET', 'board', token)
+def get_boards(chat_id):
+    """Токены всех досок, сохранённых в чате, в порядке добавления."""
+    session = sessions.get(chat_id)
+    if not session:
+        return []
+    return session.get('boards') or [session['token']]
+
+
+def board_title(board_data, number):
+    """Название доски для кнопок и заголовков (или «Доска N», если данных нет)."""
+    if board_data and 'board' in board_data:
+        return board_data['board']['appearance']['title']
+    return f"Доска {number}"
 
 
 def get_players(board_data):
@@ -64,23 +144,55 @@ def get_players(board_data):
     return None
 
 
-def print_players(players):
-    """Форматированный вывод списка игроков."""
+def stale_notice(board_data):
+    """Предупреждение для данных доски, показанных из кэша при недоступном API."""
+    if is_stale(board_data):
+        return "⚠️ keepthescore.com сейчас недоступен, показаны последние сохранённые данные.\n\n"
+    return ""
+
+
+def print_players(players, page=0, top_k=None):
+    """Форматированный вывод страницы списка игроков."""
     if not players:
         return "Нет данных об игроках"
 
-    result = "Список игроков:\n"
-    for player in players:
-        result += f"Имя: {player['name']} Очки: {player['score']}\n"
-    return result
+    pages = render_player_pages(players, top_k)
+    return pages[min(max(page, 0), len(pages) - 1)]
+
+
+def players_list_keyboard(players, page=0, top_k=None):
+    """Кнопки листания списка игроков, переключения топа и возврата в меню."""
+    return _players_list_keyboard(page, len(render_player_pages(players, top_k)), bool(top_k))
+
+
+@functools.lru_cache(maxsize=256)
+def _players_list_keyboard(page, pages, top):
+    # Клавиатура зависит только от страницы, числа страниц и режима, поэтому строится один раз
+    action = "list_top" if top else "list_all"
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("◀️", callback_data=encode(action, page - 1)))
+    if page < pages - 1:
+        navigation.append(InlineKeyboardButton("▶️", callback_data=encode(action, page + 1)))
+    keyboard = [navigation] if navigation else []
+    if top:
+        keyboard.append([InlineKeyboardButton("Все игроки", callback_data=encode('list_all', 0))])
+    else:
+        keyboard.append([InlineKeyboardButton(f"Топ-{TOP_PLAYERS}", callback_data=encode('list_top', 0))])
+    keyboard.append([InlineKeyboardButton("Главное меню", callback_data=encode('main_menu'))])
+    return InlineKeyboardMarkup(keyboard)
+
+
+async def edit_message_if_changed(query, text, reply_markup=None) -> None:
+    """Редактирует сообщение, только если текст или клавиатура действительно изменились."""
+    if query.message and query.message.text == text and query.message.reply_markup == reply_markup:
+        return
+    await query.edit_message_text(text, reply_markup=reply_markup)
 
 
 def find_player_by_input(players, input_str):
     """Поиск игрока по имени или ID."""
-    return [
-        player for player in players
-        if player['name'] == input_str or str(player['id']) == input_str
-    ]
+    return get_player_index(players).find(input_str)
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -97,41 +209,43 @@ async def enter_token(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         await update.message.reply_text("Ошибка: Токен не может быть пустым. Попробуйте еще раз /start")
         return ENTER_TOKEN
 
-    user_data[update.message.chat_id] = {'token': token}
+    chat_id = update.message.chat_id
+    boards = get_boards(chat_id)
+    if token not in boards:
+        if len(boards) >= MAX_BOARDS_PER_CHAT:
+            await update.message.reply_text(f"В чате уже сохранено {MAX_BOARDS_PER_CHAT} досок, больше добавить "
+                                            f"нельзя.")
+            await show_main_menu(update, context)
+            return MAIN_MENU
+        boards = boards + [token]
+    sessions.set(chat_id, dict(sessions.get(chat_id) or {}, token=token, boards=boards))
     await show_main_menu(update, context)
     return MAIN_MENU
 
 
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Показывает главное меню."""
-    keyboard = [
-        [InlineKeyboardButton("Список игроков", callback_data="list_players"),
-         InlineKeyboardButton("Добавить игрока", callback_data="add_player")],
-        [InlineKeyboardButton("Редактировать игрока", callback_data="edit_player"),
-         InlineKeyboardButton("Редактировать очки", callback_data="edit_scores")],
-        [InlineKeyboardButton("Переименовать доску", callback_data="board_rename"),
-         InlineKeyboardButton("Сбросить очки", callback_data="reset_all")],
-        [InlineKeyboardButton("Удалить игрока", callback_data="delete_player")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
     if update.callback_query:
-        await update.callback_query.edit_message_text("Что вы хотите сделать?", reply_markup=reply_markup)
+        await update.callback_query.edit_message_text("Что вы хотите сделать?", reply_markup=MAIN_MENU_KEYBOARD)
     else:
-        await update.message.reply_text("Что вы хотите сделать?", reply_markup=reply_markup)
+        await update.message.reply_text("Что вы хотите сделать?", reply_markup=MAIN_MENU_KEYBOARD)
 
 
 async def list_players(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Выводит список игроков."""
     logger.info("Вызвана функция list_players") # Логируем
     chat_id = update.callback_query.message.chat_id
-    token = user_data[chat_id]['token']
-    board_data = get_board_data(token)
+    token = get_token(chat_id)
+    page = context.args[0] if context.args else 0
+    top_k = TOP_PLAYERS if context.callback_action == "list_top" else None
+
+    board_data = await get_board_data(token, allow_stale=True)
     if board_data:
         players = get_players(board_data)
         if players:
-            player_list = print_players(players)
-            await update.callback_query.edit_message_text(text=player_list, reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("Главное меню", callback_data="main_menu")]]))
+            player_list = stale_notice(board_data) + print_players(players, page, top_k)
+            await edit_message_if_changed(update.callback_query, player_list,
+                                          players_list_keyboard(players, page, top_k))
             await update.callback_query.answer()  # Добавляем answer()
             logger.info("Успешно выведен список игроков и предложена кнопка 'Главное меню'") # Логируем
         else:
@@ -143,16 +257,87 @@ async def list_players(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     return MAIN_MENU
 
 
+async def show_boards(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Показывает доски чата: переключение активной доски, добавление новой и общий топ."""
+    chat_id = update.callback_query.message.chat_id
+    boards = get_boards(chat_id)
+    active = get_token(chat_id)
+    # Названия всех досок запрашиваются одновременно (обычно они уже в кэше)
+    boards_data = await asyncio.gather(*(get_board_data(token, allow_stale=True) for token in boards))
+
+    keyboard = [[InlineKeyboardButton(("✅ " if token == active else "") + board_title(board_data, number),
+                                      callback_data=encode('switch_board', number - 1))]
+                for number, (token, board_data) in enumerate(zip(boards, boards_data), 1)]
+    actions = [InlineKeyboardButton("Добавить доску", callback_data=encode('add_board'))]
+    if len(boards) > 1:
+        actions.append(InlineKeyboardButton("Общий топ", callback_data=encode('aggregate_top')))
+    keyboard.append(actions)
+    keyboard.append([InlineKeyboardButton("Главное меню", callback_data=encode('main_menu'))])
+    await edit_message_if_changed(update.callback_query, "Доски чата (✅ — текущая):", InlineKeyboardMarkup(keyboard))
+    await update.callback_query.answer()
+    return MAIN_MENU
+
+
+async def switch_board(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Делает выбранную доску активной."""
+    chat_id = update.callback_query.message.chat_id
+    boards = get_boards(chat_id)
+    index = context.args[0]
+    if index >= len(boards):
+        await update.callback_query.answer("Доска не найдена")
+        return await show_boards(update, context)
+
+    sessions.set(chat_id, dict(sessions.get(chat_id), token=boards[index], boards=boards))
+    await update.callback_query.answer("Доска выбрана")
+    await show_main_menu(update, context)
+    return MAIN_MENU
+
+
+async def add_board(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Запрашивает токен ещё одной доски."""
+    await update.callback_query.edit_message_text("Введите токен доски, которую нужно добавить:")
+    await update.callback_query.answer()
+    return ENTER_TOKEN
+
+
+async def aggregate_top(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Показывает общий топ игроков по всем доскам чата."""
+    chat_id = update.callback_query.message.chat_id
+    boards = get_boards(chat_id)
+    # Доски запрашиваются одновременно: ожидание — как у самой медленной доски, а не сумма
+    boards_data = await asyncio.gather(*(get_board_data(token, allow_stale=True) for token in boards))
+    available = [(board_title(board_data, number), get_players(board_data))
+                 for number, board_data in enumerate(boards_data, 1) if get_players(board_data)]
+    if not available:
+        await update.callback_query.answer("Не удалось получить данные досок")
+        return MAIN_MENU
+
+    text = render_aggregate(available, TOP_PLAYERS)
+    if len(available) < len(boards):
+        text += f"\n\n⚠️ Не удалось получить досок: {len(boards) - len(available)}"
+    text = stale_notice(next(filter(is_stale, boards_data), None)) + text
+    await edit_message_if_changed(update.callback_query, text, AGGREGATE_KEYBOARD)
+    await update.callback_query.answer()
+    return MAIN_MENU
+
+
 async def add_player(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Запрашивает имя нового игрока."""
-    await update.callback_query.edit_message_text("Введите имя нового игрока (или 'отмена' для отмены):")
+    await update.callback_query.edit_message_text("Введите имя нового игрока (или 'отмена' для отмены).\n"
+                                                  "Чтобы добавить несколько игроков, пишите по одному имени в строке.")
     return ENTER_PLAYER_NAME
 
 
+async def reply_summary(update: Update, title, lines) -> None:
+    """Отправляет итог массовой операции, разбивая его на сообщения допустимой длины."""
+    for page in paginate_lines([title] + lines):
+        await update.message.reply_text(page)
+
+
 async def enter_player_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Добавляет нового игрока."""
+    """Добавляет нового игрока или нескольких (по одному имени в строке)."""
     chat_id = update.message.chat_id
-    token = user_data[chat_id]['token']
+    token = get_token(chat_id)
     name = update.message.text.strip()
 
     if not name or name.lower() == 'отмена':
@@ -160,7 +345,20 @@ async def enter_player_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await show_main_menu(update, context)
         return MAIN_MENU
 
-    response = make_api_request('POST', 'player', token, {"name": name})
+    names = split_lines(name)
+    if len(names) > 1:
+        if len(names) > BULK_MAX_LINES:
+            await update.message.reply_text(f"Слишком много строк: можно добавить не больше {BULK_MAX_LINES} "
+                                            f"игроков за раз.")
+            return ENTER_PLAYER_NAME
+        results = await add_players(token, names)
+        added = sum(ok for _, ok in results)
+        await reply_summary(update, f"Добавлено игроков: {added} из {len(results)}",
+                            [f"✅ {name}" if ok else f"❌ {name} — не удалось добавить" for name, ok in results])
+        await show_main_menu(update, context)
+        return MAIN_MENU
+
+    response = await make_api_request('POST', 'player', token, {"name": name})
     if response:
         await update.message.reply_text("Игрок успешно создан!")
     else:
@@ -169,13 +367,12 @@ async def enter_player_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
     return MAIN_MENU
 
 
-async def edit_player(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Выбор игрока для переименования."""
-    logger.info("Вызвана функция edit_player") # Log
+async def show_player_picker(update: Update, context: ContextTypes.DEFAULT_TYPE, action: str, page: int = 0) -> int:
+    """Показывает страницу клавиатуры выбора игрока для действия action."""
     chat_id = update.callback_query.message.chat_id
-    token = user_data[chat_id]['token']
+    token = get_token(chat_id)
 
-    board_data = get_board_data(token)
+    board_data = await get_board_data(token, allow_stale=True)
     if not board_data:
         await update.callback_query.answer("Не удалось получить данные доски")
         await show_main_menu(update, context)
@@ -187,22 +384,55 @@ async def edit_player(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         await show_main_menu(update, context)
         return MAIN_MENU
 
-    keyboard = []
-    for player in players:
-        keyboard.append([InlineKeyboardButton(player['name'], callback_data=f"select_player_rename_{player['id']}")])
-    keyboard.append([InlineKeyboardButton("Отмена", callback_data="main_menu")]) # Кнопка Отмена
+    title, state = PLAYER_PICKERS[action]
+    context.user_data['picker'] = action
+    await edit_message_if_changed(update.callback_query,
+                                  f"{stale_notice(board_data)}{title}\n(или отправьте начало имени для поиска)",
+                                  player_keyboard(players, action, page))
+    await update.callback_query.answer()
+    return state
 
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text("Выберите игрока для переименования:", reply_markup=reply_markup)
-    await update.callback_query.answer() # Add answer
-    return SELECT_PLAYER_RENAME
+
+async def player_picker_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Листает клавиатуру выбора игрока."""
+    action = context.callback_action[len("page_"):]
+    return await show_player_picker(update, context, action, context.args[0])
+
+
+async def search_player(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Ищет игрока по началу имени в текущем окне выбора."""
+    chat_id = update.message.chat_id
+    token = get_token(chat_id)
+    action = context.user_data['picker']
+    title, state = PLAYER_PICKERS[action]
+
+    board_data = await get_board_data(token, allow_stale=True)
+    players = get_players(board_data)
+    if not players:
+        await update.message.reply_text("Не удалось получить список игроков")
+        await show_main_menu(update, context)
+        return MAIN_MENU
+
+    found = get_player_index(players).find_prefix(update.message.text.strip(), limit=PLAYERS_PER_PAGE)
+    if not found:
+        await update.message.reply_text("Игроки не найдены. Попробуйте еще раз:",
+                                        reply_markup=player_keyboard(players, action))
+        return state
+
+    await update.message.reply_text(stale_notice(board_data) + title, reply_markup=search_keyboard(found, action))
+    return state
+
+
+async def edit_player(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Выбор игрока для переименования."""
+    logger.info("Вызвана функция edit_player") # Log
+    return await show_player_picker(update, context, "select_player_rename")
 
 
 async def select_player_rename(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Запрашивает новое имя игрока."""
     logger.info("Вызвана функция select_player_rename") # Log
-    player_id = update.callback_query.data.split('_')[-1]
-    context.user_data['player_id'] = player_id
+    context.user_data['player_id'] = str(context.args[0])
     await update.callback_query.edit_message_text("Введите новое имя игрока (или 'отмена' для отмены):")
     await update.callback_query.answer() # Add answer
     return ENTER_NEW_PLAYER_NAME
@@ -211,7 +441,7 @@ async def select_player_rename(update: Update, context: ContextTypes.DEFAULT_TYP
 async def enter_new_player_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Переименовывает игрока."""
     chat_id = update.message.chat_id
-    token = user_data[chat_id]['token']
+    token = get_token(chat_id)
     new_name = update.message.text.strip()
     player_id = context.user_data['player_id']
 
@@ -220,7 +450,7 @@ async def enter_new_player_name(update: Update, context: ContextTypes.DEFAULT_TY
         await show_main_menu(update, context)
         return MAIN_MENU
 
-    response = make_api_request('PATCH', f'player/{player_id}', token, {"name": new_name})
+    response = await make_api_request('PATCH', f'player/{player_id}', token, {"name": new_name})
     if response:
         await update.message.reply_text("Имя игрока успешно изменено!")
     else:
@@ -233,45 +463,15 @@ async def enter_new_player_name(update: Update, context: ContextTypes.DEFAULT_TY
 async def delete_player(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Выбор игрока для удаления."""
     logger.info("Вызвана функция delete_player")  # Log
-    chat_id = update.callback_query.message.chat_id
-    token = user_data[chat_id]['token']
-
-    board_data = get_board_data(token)
-    if not board_data:
-        await update.callback_query.answer("Не удалось получить данные доски")
-        await show_main_menu(update, context)
-        return MAIN_MENU
-
-    players = get_players(board_data)
-    if not players:
-        await update.callback_query.answer("Не удалось получить список игроков")
-        await show_main_menu(update, context)
-        return MAIN_MENU
-
-    keyboard = []
-    for player in players:
-        keyboard.append([InlineKeyboardButton(player['name'], callback_data=f"confirm_delete_{player['id']}")])
-    keyboard.append([InlineKeyboardButton("Отмена", callback_data="main_menu")])
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text("Выберите игрока для удаления:", reply_markup=reply_markup)
-    await update.callback_query.answer() # Важно!
-    return SELECT_PLAYER_DELETE
+    return await show_player_picker(update, context, "confirm_delete")
 
 
 async def confirm_delete(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Подтверждает удаление игрока."""
     logger.info("Вызвана функция confirm_delete")  # Log
-    player_id = update.callback_query.data.split('_')[-1]
-    context.user_data['player_id'] = player_id
-
-    keyboard = [
-        [InlineKeyboardButton("Удалить", callback_data=f"delete_player_confirmed"),
-         InlineKeyboardButton("Отмена", callback_data="main_menu")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    context.user_data['player_id'] = str(context.args[0])
     await update.callback_query.edit_message_text("Вы уверены, что хотите удалить этого игрока?",
-                                                  reply_markup=reply_markup)
+                                                  reply_markup=CONFIRM_DELETE_KEYBOARD)
     await update.callback_query.answer()  # Важно!
     return CONFIRM_DELETE
 
@@ -279,10 +479,10 @@ async def confirm_delete(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 async def delete_player_confirmed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Удаляет игрока."""
     chat_id = update.callback_query.message.chat_id
-    token = user_data[chat_id]['token']
+    token = get_token(chat_id)
     player_id = context.user_data['player_id']
 
-    response = make_api_request('DELETE', f'player/{player_id}', token)
+    response = await make_api_request('DELETE', f'player/{player_id}', token)
     if response:
         await update.callback_query.answer("Игрок успешно удален!")
     else:
@@ -295,38 +495,13 @@ async def delete_player_confirmed(update: Update, context: ContextTypes.DEFAULT_
 async def edit_scores(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Выбор игрока для редактирования очков."""
     logger.info("Вызвана функция edit_scores") # Log
-    chat_id = update.callback_query.message.chat_id
-    token = user_data[chat_id]['token']
-
-    board_data = get_board_data(token)
-    if not board_data:
-        await update.callback_query.answer("Не удалось получить данные доски")
-        await show_main_menu(update, context)
-        return MAIN_MENU
-
-    players = get_players(board_data)
-    if not players:
-        await update.callback_query.answer("Не удалось получить список игроков")
-        await show_main_menu(update, context)
-        return MAIN_MENU
-
-    keyboard = []
-    for player in players:
-        keyboard.append([InlineKeyboardButton(player['name'], callback_data=f"select_score_edit_{player['id']}")])
-    keyboard.append([InlineKeyboardButton("Отмена", callback_data="main_menu")])
-
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text("Выберите игрока, чтобы изменить очки:",
-                                                  reply_markup=reply_markup)
-    await update.callback_query.answer()  # Важно!
-    return SELECT_PLAYER_SCORE
+    return await show_player_picker(update, context, "select_score_edit")
 
 
 async def select_score_edit(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Запрашивает изменение очков."""
     logger.info("Вызвана функция select_score_edit") # Log
-    player_id = update.callback_query.data.split('_')[-1]
-    context.user_data['player_id'] = player_id
+    context.user_data['player_id'] = str(context.args[0])
     await update.callback_query.edit_message_text("Введите изменение очков (например, +5 или -3, или "
                                                   "'отмена' для отмены):")
     await update.callback_query.answer()  # Важно!
@@ -336,7 +511,7 @@ async def select_score_edit(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def enter_score_change(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Изменяет очки игрока."""
     chat_id = update.message.chat_id
-    token = user_data[chat_id]['token']
+    token = get_token(chat_id)
     score_input = update.message.text.strip()
     player_id = context.user_data['player_id']
 
@@ -349,7 +524,13 @@ async def enter_score_change(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("Очки должны быть целым числом. Используйте + для добавления, - для вычитания.")
         return ENTER_SCORE_CHANGE
 
-    response = make_api_request('POST', 'score', token, {
+    if score_batcher is not None:
+        score_batcher.add(token, player_id, int(score_input), chat_id)
+        await update.message.reply_text("Изменение очков принято и будет отправлено в течение нескольких секунд.")
+        await show_main_menu(update, context)
+        return MAIN_MENU
+
+    response = await make_api_request('POST', 'score', token, {
         "player_id": player_id,
         "score": int(score_input)
     })
@@ -362,12 +543,55 @@ async def enter_score_change(update: Update, context: ContextTypes.DEFAULT_TYPE)
     return MAIN_MENU
 
 
+async def bulk_scores(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Запрашивает изменения очков сразу для нескольких игроков."""
+    await update.callback_query.edit_message_text("Введите изменения очков, по одному игроку в строке:\n"
+                                                  "Имя +5\nИмя -3\n(вместо имени можно указать ID, "
+                                                  "'отмена' для отмены)")
+    await update.callback_query.answer()
+    return ENTER_BULK_SCORES
+
+
+async def enter_bulk_scores(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Применяет изменения очков из строк «имя ±очки» и присылает итог по каждой строке."""
+    chat_id = update.message.chat_id
+    token = get_token(chat_id)
+    text = update.message.text.strip()
+
+    if not text or text.lower() == 'отмена':
+        await update.message.reply_text("Изменение очков отменено.")
+        await show_main_menu(update, context)
+        return MAIN_MENU
+
+    lines = split_lines(text)
+    if len(lines) > BULK_MAX_LINES:
+        await update.message.reply_text(f"Слишком много строк: не больше {BULK_MAX_LINES} за раз.")
+        return ENTER_BULK_SCORES
+    entries, invalid = parse_score_lines(lines)
+    if invalid:
+        await reply_summary(update, "Не удалось разобрать строки (нужно «имя +5» или «имя -3»):", invalid)
+        return ENTER_BULK_SCORES
+
+    players = get_players(await get_board_data(token))
+    if players is None:
+        await update.message.reply_text("Не удалось получить список игроков. Попробуйте позже.")
+        await show_main_menu(update, context)
+        return MAIN_MENU
+
+    results = await apply_scores(token, players, entries)
+    applied = sum(error is None for _, error in results)
+    await reply_summary(update, f"Изменено строк: {applied} из {len(results)}",
+                        [f"✅ {line}" if error is None else f"❌ {line} — {error}" for line, error in results])
+    await show_main_menu(update, context)
+    return MAIN_MENU
+
+
 async def board_rename(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Запрашивает новое название доски."""
     chat_id = update.callback_query.message.chat_id
-    token = user_data[chat_id]['token']
+    token = get_token(chat_id)
 
-    board_data = get_board_data(token)
+    board_data = await get_board_data(token)
     if not board_data or 'board' not in board_data:
         await update.callback_query.answer("Не удалось получить данные доски")
         await show_main_menu(update, context)
@@ -382,7 +606,7 @@ async def board_rename(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 async def enter_board_rename(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Переименовывает доску."""
     chat_id = update.message.chat_id
-    token = user_data[chat_id]['token']
+    token = get_token(chat_id)
     new_title = update.message.text.strip()
 
     if not new_title or new_title.lower() == 'отмена':
@@ -390,7 +614,7 @@ async def enter_board_rename(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await show_main_menu(update, context)
         return MAIN_MENU
 
-    board_data = get_board_data(token)
+    board_data = await get_board_data(token)
     if not board_data or 'board' not in board_data:
         await update.message.reply_text("Не удалось получить данные доски.")
         await show_main_menu(update, context)
@@ -406,7 +630,7 @@ async def enter_board_rename(update: Update, context: ContextTypes.DEFAULT_TYPE)
         "goal_value": appearance['goal_value']
     }
 
-    response = make_api_request('PUT', 'board', token, payload)
+    response = await make_api_request('PUT', 'board', token, payload)
     if response:
         await update.message.reply_text("Название доски успешно изменено!")
     else:
@@ -420,15 +644,9 @@ async def reset_all(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Сбрасывает все очки."""
     logger.info("Вызвана функция reset_all")
     chat_id = update.callback_query.message.chat_id
-    token = user_data[chat_id]['token']
-
-    keyboard = [
-        [InlineKeyboardButton("Сбросить все очки", callback_data="confirm_reset"),
-         InlineKeyboardButton("Отмена", callback_data="main_menu")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    token = get_token(chat_id)
     await update.callback_query.edit_message_text("Вы уверены, что хотите сбросить все очки?",
-                                                  reply_markup=reply_markup)
+                                                  reply_markup=CONFIRM_RESET_KEYBOARD)
     await update.callback_query.answer()
     return CONFIRM_DELETE
 
@@ -437,9 +655,9 @@ async def confirm_reset(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     """Выполняет сброс очков."""
     logger.info("Вызвана функция confirm_reset")
     chat_id = update.callback_query.message.chat_id
-    token = user_data[chat_id]['token']
+    token = get_token(chat_id)
 
-    response = make_api_request('POST', 'board/reset-scores', token)
+    response = await make_api_request('POST', 'board/reset-scores', token)
     if response:
         await update.callback_query.answer("Все очки успешно обнулены!")  # Отправляем подтверждение
     else:
@@ -449,6 +667,84 @@ async def confirm_reset(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
     return MAIN_MENU
 
 
+def render_watch(board_data):
+    """Текст закреплённого сообщения живой таблицы."""
+    return ("📌 Таблица обновляется автоматически (/unwatch — отключить)\n\n"
+            + print_players(get_players(board_data), top_k=TOP_PLAYERS))
+
+
+async def watch(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Закрепляет в чате сообщение с таблицей, которое обновляется при изменении очков."""
+    chat_id = update.effective_chat.id
+    token = get_token(chat_id)
+    if not token:
+        await update.message.reply_text("Сначала укажите токен доски: /start")
+        return
+    if not await watch_manager.subscribe(chat_id, token):
+        await update.message.reply_text("Не удалось получить данные доски. Попробуйте позже.")
+
+
+async def unwatch(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Отключает живую таблицу в чате и открепляет её сообщение."""
+    chat_id = update.effective_chat.id
+    message_id = watch_manager.unsubscribe(chat_id)
+    if message_id is None:
+        await update.message.reply_text("Живая таблица в этом чате не включена.")
+        return
+    try:
+        await context.bot.unpin_chat_message(chat_id, message_id)
+    except TelegramError as e:
+        logger.warning(f"Не удалось открепить сообщение в чате {chat_id}: {e}")
+    await update.message.reply_text("Живая таблица отключена.")
+
+
+def parse_days(value):
+    """Число дней из аргумента команды или None, если это не число от 1 до 365."""
+    return int(value) if value.isdigit() and 1 <= int(value) <= 365 else None
+
+
+async def trend(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Показывает динамику очков игрока по дням: /trend <имя или ID> [дней]."""
+    token = get_token(update.effective_chat.id)
+    if not token:
+        await update.message.reply_text("Сначала укажите токен доски: /start")
+        return
+    args = list(context.args or [])
+    days = TREND_DAYS
+    if len(args) > 1 and parse_days(args[-1]):
+        days = parse_days(args.pop())
+    if not args:
+        await update.message.reply_text("Использование: /trend <имя или ID игрока> [дней]")
+        return
+
+    found = history.find_players(token, " ".join(args))
+    if not found:
+        await update.message.reply_text("Игрок не найден в истории доски.")
+        return
+    if len(found) > 1:
+        await update.message.reply_text("Найдено несколько игроков с таким именем, укажите ID: "
+                                        + ", ".join(player_id for player_id, _ in found))
+        return
+    player_id, name = found[0]
+    since = time.time() - days * DAY
+    await update.message.reply_text(render_trend(name or player_id, history.trend(token, player_id, since),
+                                                 since, days))
+
+
+async def movers(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Показывает игроков, чьи очки больше всего изменились: /movers [дней]."""
+    token = get_token(update.effective_chat.id)
+    if not token:
+        await update.message.reply_text("Сначала укажите токен доски: /start")
+        return
+    days = parse_days(context.args[0]) if context.args else TREND_DAYS
+    if days is None:
+        await update.message.reply_text("Использование: /movers [дней, от 1 до 365]")
+        return
+    result = history.movers(token, time.time() - days * DAY, limit=MOVERS_LIMIT)
+    await update.message.reply_text(render_movers(result, days))
+
+
 async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Возвращает в главное меню."""
     logger.info("Вызвана функция main_menu") # Логируем
@@ -456,6 +752,13 @@ async def main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return MAIN_MENU
 
 
+async def stale_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Отвечает на нажатие кнопки из сообщения старого формата и показывает главное меню."""
+    await update.callback_query.answer("Это меню устарело")
+    await show_main_menu(update, context)
+    return MAIN_MENU
+
+
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Отменяет текущую операцию."""
     await update.message.reply_text("Действие отменено.")
@@ -463,45 +766,153 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     return MAIN_MENU
 
 
-def main() -> None:
-    """Запуск бота."""
-    application = ApplicationBuilder().token(BOT_TOKEN).build()
+def create_score_batcher(application) -> ScoreBatcher:
+    """Создаёт накопитель очков, который сообщает результат каждого пакета в чаты."""
+    async def report(token, player_id, delta, chat_ids, ok):
+        if ok:
+            text = f"Очки успешно изменены! (итоговое изменение: {delta:+d})"
+        else:
+            text = f"Не удалось изменить очки (итоговое изменение: {delta:+d}). Попробуйте позже."
+        for chat_id in chat_ids:
+            await application.bot.send_message(chat_id, text)
+
+    return ScoreBatcher(window=SCORE_BATCH_WINDOW, on_flush=report)
+
+
+async def post_stop(application) -> None:
+    """Отправляет накопленные изменения очков и останавливает опрос живых таблиц."""
+    if score_batcher is not None:
+        await score_batcher.flush_all()
+    if watch_manager is not None:
+        await watch_manager.close()
+
+
+async def post_init(application) -> None:
+    """Запускает эндпоинт метрик, если он включён."""
+    global metrics_server
+    if METRICS_PORT:
+        metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+
+async def post_shutdown(application) -> None:
+    """Закрывает соединения с API и эндпоинт метрик при остановке бота."""
+    global metrics_server
+    await close_client()
+    sessions.close()
+    history.close()
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+        metrics_server = None
+
+
+def instrument_handlers(conv_handler) -> None:
+    """Оборачивает все обработчики диалога для метрик и трассировки."""
+    handlers = list(conv_handler.entry_points) + list(conv_handler.fallbacks)
+    for state_handlers in conv_handler.states.values():
+        handlers += state_handlers
+    for handler in handlers:
+        if isinstance(handler, CallbackRouter):
+            handler.routes = {action: traced(callback) for action, callback in handler.routes.items()}
+        else:
+            handler.callback = traced(handler.callback)
+
+
+def build_application(builder=None):
+    """Создаёт приложение бота со всеми обработчиками.
+
+    builder позволяет подставить заранее настроенный ApplicationBuilder (например,
+    с фейковым транспортом Telegram в нагрузочных тестах).
+    """
+    global score_batcher, watch_manager, sessions, history
+    if sessions is None:
+        sessions = SQLiteSessionStore(SESSION_DB_PATH, max_idle=SESSION_MAX_IDLE, max_active=SESSION_MAX_ACTIVE)
+    if history is None:
+        history = ScoreHistory(HISTORY_DB_PATH, compact_after=HISTORY_COMPACT_AFTER, retention=HISTORY_RETENTION)
+    create_gauges()
+    update_processor = ChatOrderedUpdateProcessor(CONCURRENT_UPDATES)
+    application = ((builder or ApplicationBuilder()).token(BOT_TOKEN).persistence(SQLitePersistence(SESSION_DB_PATH))
+                   .concurrent_updates(update_processor)
+                   .rate_limiter(TelegramRateLimiter(TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST))
+                   .post_init(post_init).post_stop(post_stop).post_shutdown(post_shutdown).build())
+    active_chats_gauge.function = update_processor.active_chats
+    user_data_gauge.function = lambda: len(application.user_data)
+    if SCORE_BATCH_ENABLED:
+        score_batcher = create_score_batcher(application)
+    watch_manager = WatchManager(application.bot, render_watch, WATCH_MIN_INTERVAL, WATCH_MAX_INTERVAL)
+    if history.record_board not in api.board_listeners:
+        api.board_listeners.append(history.record_board)
+        api.write_listeners.append(history.record_write)
 
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
         states={
             ENTER_TOKEN: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_token)],
-            MAIN_MENU: [CallbackQueryHandler(list_players, pattern="^list_players$"),
-                        CallbackQueryHandler(add_player, pattern="^add_player$"),
-                        CallbackQueryHandler(edit_player, pattern="^edit_player$"),
-                        CallbackQueryHandler(delete_player, pattern="^delete_player$"),
-                        CallbackQueryHandler(edit_scores, pattern="^edit_scores$"),
-                        CallbackQueryHandler(board_rename, pattern="^board_rename$"),
-                        CallbackQueryHandler(reset_all, pattern="^reset_all$"),
-                        CallbackQueryHandler(main_menu, pattern="^main_menu$")],  # main menu доступен в главном меню
+            MAIN_MENU: [CallbackRouter({"list_all": list_players, "list_top": list_players, "add_player": add_player,
+                                        "edit_player": edit_player, "delete_player": delete_player,
+                                        "edit_scores": edit_scores, "board_rename": board_rename,
+                                        "reset_all": reset_all, "bulk_scores": bulk_scores, "boards": show_boards,
+                                        "switch_board": switch_board, "add_board": add_board,
+                                        "aggregate_top": aggregate_top, "main_menu": main_menu})],
             ENTER_PLAYER_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_player_name)],
-            SELECT_PLAYER_RENAME: [CallbackQueryHandler(select_player_rename, pattern="^select_player_rename_"),
-                                   CallbackQueryHandler(main_menu, pattern="^main_menu$")],  # обработка "Отмена"
+            SELECT_PLAYER_RENAME: [CallbackRouter({"select_player_rename": select_player_rename,
+                                                   "page_select_player_rename": player_picker_page,
+                                                   "main_menu": main_menu}),  # main_menu — кнопка "Отмена"
+                                   MessageHandler(filters.TEXT & ~filters.COMMAND, search_player)],
             ENTER_NEW_PLAYER_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_new_player_name)],
-            SELECT_PLAYER_DELETE: [CallbackQueryHandler(delete_player, pattern="^delete_player$"),
-                                   CallbackQueryHandler(confirm_delete, pattern="^confirm_delete_"),
-                                   CallbackQueryHandler(main_menu, pattern="^main_menu$")],  #
-            CONFIRM_DELETE: [CallbackQueryHandler(delete_player_confirmed, pattern="^delete_player_confirmed$"),
-                             CallbackQueryHandler(confirm_reset, pattern="^confirm_reset$"),
-                             CallbackQueryHandler(main_menu, pattern="^main_menu$")],  # обработка "Отмена"
-            SELECT_PLAYER_SCORE: [CallbackQueryHandler(select_score_edit, pattern="^select_score_edit_"),
-                                  CallbackQueryHandler(main_menu, pattern="^main_menu$")],  # обработка "Отмена"
+            SELECT_PLAYER_DELETE: [CallbackRouter({"delete_player": delete_player, "confirm_delete": confirm_delete,
+                                                   "page_confirm_delete": player_picker_page,
+                                                   "main_menu": main_menu}),
+                                   MessageHandler(filters.TEXT & ~filters.COMMAND, search_player)],
+            CONFIRM_DELETE: [CallbackRouter({"delete_player_confirmed": delete_player_confirmed,
+                                             "confirm_reset": confirm_reset, "main_menu": main_menu})],
+            SELECT_PLAYER_SCORE: [CallbackRouter({"select_score_edit": select_score_edit,
+                                                  "page_select_score_edit": player_picker_page,
+                                                  "main_menu": main_menu}),
+                                  MessageHandler(filters.TEXT & ~filters.COMMAND, search_player)],
             ENTER_SCORE_CHANGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_score_change)],
             ENTER_BOARD_RENAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_board_rename)],
+            ENTER_BULK_SCORES: [MessageHandler(filters.TEXT & ~filters.COMMAND, enter_bulk_scores)],
 
         },
-        fallbacks=[CommandHandler("cancel", cancel)],
+        fallbacks=[CommandHandler("cancel", cancel), StaleCallbackHandler(stale_button)],
+        name="scorebot",
+        persistent=True,
     )
 
+    instrument_handlers(conv_handler)
     application.add_handler(conv_handler)
+    # Команды живой таблицы работают в любом состоянии диалога
+    application.add_handler(CommandHandler("watch", traced(watch)))
+    application.add_handler(CommandHandler("unwatch", traced(unwatch)))
+    application.add_handler(CommandHandler("trend", traced(trend)))
+    application.add_handler(CommandHandler("movers", traced(movers)))
+    return application
+
+
+def main() -> None:
+    """Запуск бота."""
+    if RUN_MODE == "workers":
+        # Импорт здесь: workers сам импортирует main
+        from workers import run_supervisor
+        print("Бот запущен в режиме нескольких процессов!")
+        run_supervisor()
+        return
+
+    application = build_application()
 
     print("Бот запущен!")
-    application.run_polling()
+    if RUN_MODE == "webhook":
+        if not WEBHOOK_SECRET:
+            raise ValueError("Для режима webhook нужно задать WEBHOOK_SECRET")
+        # Telegram передаёт секрет в заголовке X-Telegram-Bot-Api-Secret-Token, запросы без него отклоняются
+        application.run_webhook(listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, url_path=WEBHOOK_PATH,
+                                webhook_url=WEBHOOK_URL or None, secret_token=WEBHOOK_SECRET,
+                                max_connections=WEBHOOK_MAX_CONNECTIONS)
+    elif RUN_MODE == "polling":
+        application.run_polling()
+    else:
+        raise ValueError(f"Неизвестный режим запуска: {RUN_MODE}")
 
 
 if __name__ == '__main__':
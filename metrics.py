@@ -0,0 +1,184 @@
+import asyncio
+import functools
+import logging
+import time
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Все зарегистрированные метрики в порядке создания. Метрики копятся в памяти всегда
+# (это несколько операций со словарём на запрос), а наружу отдаются, только если
+# запущен start_metrics_server
+REGISTRY = []
+
+# Хуки трассировки: вызываются после каждого обработчика как hook(name, duration, error)
+trace_hooks = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.label_names)
+
+    def samples(self):
+        """Строки выгрузки: (имя, метки, значение)."""
+        for key, value in self._values.items():
+            yield self.name, _format_labels(self.label_names, key), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {value}" for name, labels, value in self.samples()]
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """Текущее значение; можно задать функцию, которая вычисляет его при выгрузке."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labels=(), function=None):
+        super().__init__(name, documentation, labels)
+        self.function = function
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                self.set(self.function())
+            except Exception as e:
+                logger.warning(f"Не удалось вычислить метрику {self.name}: {e}")
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными границами корзин (для задержек)."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            # Счётчики по корзинам (последняя — +Inf), сумма и количество
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self):
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                yield (f"{self.name}_bucket", _format_labels(self.label_names, key, [('le', bound)]),
+                       cumulative)
+            yield f"{self.name}_sum", _format_labels(self.label_names, key), total
+            yield f"{self.name}_count", _format_labels(self.label_names, key), count
+
+
+def render_metrics():
+    """Все метрики в текстовом формате Prometheus."""
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+
+# Метрики обработчиков Telegram
+handler_duration = Histogram('scorebot_handler_duration_seconds', "Время работы обработчика", ['handler'])
+handler_in_flight = Gauge('scorebot_handler_in_flight', "Обработчики, выполняющиеся сейчас", ['handler'])
+handler_errors = Counter('scorebot_handler_errors_total', "Исключения в обработчиках", ['handler'])
+
+
+def traced(callback, name=None):
+    """Оборачивает обработчик: замер времени, счётчик выполняющихся, ошибки и хуки трассировки."""
+    name = name or callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(*args, **kwargs):
+        handler_in_flight.inc(handler=name)
+        started = time.perf_counter()
+        error = None
+        try:
+            return await callback(*args, **kwargs)
+        except Exception as e:
+            error = e
+            handler_errors.inc(handler=name)
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            handler_in_flight.dec(handler=name)
+            handler_duration.observe(duration, handler=name)
+            for hook in trace_hooks:
+                try:
+                    hook(name, duration, error)
+                except Exception as e:
+                    logger.warning(f"Ошибка в хуке трассировки: {e}")
+
+    return wrapper
+
+
+async def _serve_metrics(reader, writer):
+    try:
+        request_line = await reader.readline()
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        parts = request_line.decode(errors='replace').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1] in ('/metrics', '/'):
+            status, body = '200 OK', render_metrics().encode()
+        else:
+            status, body = '404 Not Found', b'not found\n'
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host, port):
+    """Запускает HTTP-эндпоинт /metrics для Prometheus и возвращает asyncio-сервер."""
+    server = await asyncio.start_server(_serve_metrics, host, port)
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,92 @@
+import json
+import sqlite3
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+
+class SQLitePersistence(BasePersistence):
+    """Сохраняет состояния ConversationHandler и context.user_data в SQLite.
+
+    Данные чатов, бота и callback_data не сохраняются: сессии чатов хранит
+    SQLiteSessionStore, а остальное боту не нужно.
+    """
+
+    def __init__(self, path, update_interval=60):
+        super().__init__(store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True,
+                                                     callback_data=False),
+                         update_interval=update_interval)
+        self.path = path
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS conversations "
+                             "(name TEXT NOT NULL, key TEXT NOT NULL, state TEXT NOT NULL, PRIMARY KEY (name, key))")
+            self._db.execute("CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+        return self._db
+
+    async def get_conversations(self, name):
+        rows = self._connect().execute("SELECT key, state FROM conversations WHERE name = ?", (name,))
+        return {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+
+    async def update_conversation(self, name, key, new_state):
+        db = self._connect()
+        with db:
+            if new_state is None:
+                db.execute("DELETE FROM conversations WHERE name = ? AND key = ?", (name, json.dumps(key)))
+            else:
+                db.execute("INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                           (name, json.dumps(key), json.dumps(new_state)))
+
+    async def get_user_data(self):
+        rows = self._connect().execute("SELECT user_id, data FROM user_data")
+        return {user_id: json.loads(data) for user_id, data in rows}
+
+    async def update_user_data(self, user_id, data):
+        db = self._connect()
+        with db:
+            db.execute("INSERT OR REPLACE INTO user_data (user_id, data) VALUES (?, ?)",
+                       (user_id, json.dumps(data, ensure_ascii=False)))
+
+    async def drop_user_data(self, user_id):
+        db = self._connect()
+        with db:
+            db.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def get_chat_data(self):
+        return {}
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def get_bot_data(self):
+        return {}
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def flush(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
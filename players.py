@@ -0,0 +1,140 @@
+import heapq
+from bisect import bisect_left
+from collections import OrderedDict
+from itertools import islice
+
+# Сколько индексов досок держать в памяти
+PLAYER_INDEX_CACHE_SIZE = 256
+# Ограничение Telegram на длину текста сообщения
+MESSAGE_LIMIT = 4096
+# Место на странице, оставляемое под заголовок и предупреждение о данных из кэша (main.stale_notice)
+PAGE_HEADER_RESERVE = 128
+# Сколько отрендеренных таблиц держать в памяти
+RENDER_CACHE_SIZE = 256
+
+
+class PlayerIndex:
+    """Индекс игроков доски: поиск по ID, точному имени и началу имени."""
+
+    def __init__(self, players):
+        self.players = players
+        self.by_id = {str(player['id']): player for player in players}
+        # Отсортированные имена для поиска по префиксу бинарным поиском
+        entries = sorted((player['name'].casefold(), position) for position, player in enumerate(players))
+        self._names = [name for name, _ in entries]
+        self._positions = [position for _, position in entries]
+
+    def find_prefix(self, prefix, limit=None):
+        """Игроки, чьё имя начинается с prefix (без учёта регистра), в алфавитном порядке."""
+        prefix = prefix.casefold()
+        start = bisect_left(self._names, prefix)
+        result = []
+        for name, position in islice(zip(self._names, self._positions), start, None):
+            if not name.startswith(prefix) or (limit is not None and len(result) >= limit):
+                break
+            result.append(self.players[position])
+        return result
+
+    def find(self, input_str):
+        """Игроки с точно совпадающим именем или ID."""
+        result = [player for player in self.find_prefix(input_str) if player['name'] == input_str]
+        player = self.by_id.get(input_str)
+        if player is not None and player not in result:
+            result.append(player)
+        return result
+
+
+# id(players) -> PlayerIndex. Индекс хранит ссылку на список, поэтому id не переиспользуется,
+# пока запись в кэше; новый список игроков (новая версия доски) получает новый индекс.
+_indexes = OrderedDict()
+
+
+def get_player_index(players):
+    """Возвращает индекс для списка игроков, строя его только для новой версии доски."""
+    key = id(players)
+    index = _indexes.get(key)
+    if index is not None and index.players is players:
+        _indexes.move_to_end(key)
+        return index
+
+    index = _indexes[key] = PlayerIndex(players)
+    while len(_indexes) > PLAYER_INDEX_CACHE_SIZE:
+        _indexes.popitem(last=False)
+    return index
+
+
+def iter_player_lines(players, top_k=None):
+    """Строки таблицы игроков по убыванию очков; при top_k — только первые top_k игроков."""
+    def by_score(player):
+        return player['score']
+
+    if top_k:
+        ordered = heapq.nlargest(top_k, players, key=by_score)
+    else:
+        ordered = sorted(players, key=by_score, reverse=True)
+    for player in ordered:
+        yield f"Имя: {player['name']} Очки: {player['score']}"
+
+
+def paginate_lines(lines, limit=MESSAGE_LIMIT - PAGE_HEADER_RESERVE):
+    """Собирает строки в страницы, длина каждой страницы не больше limit символов."""
+    page, size = [], 0
+    for line in lines:
+        line = line[:limit]
+        if page and size + 1 + len(line) > limit:
+            yield "\n".join(page)
+            page, size = [], 0
+        size += len(line) + (1 if page else 0)
+        page.append(line)
+    if page:
+        yield "\n".join(page)
+
+
+# (id(players), top_k) -> (players, список страниц)
+_rendered = OrderedDict()
+
+
+def render_player_pages(players, top_k=None):
+    """Страницы таблицы игроков, готовые к отправке; для неизменной доски берутся из кэша."""
+    key = (id(players), top_k)
+    cached = _rendered.get(key)
+    if cached is not None and cached[0] is players:
+        _rendered.move_to_end(key)
+        return cached[1]
+
+    title = f"Топ-{top_k} игроков" if top_k else "Список игроков"
+    bodies = list(paginate_lines(iter_player_lines(players, top_k)))
+    if len(bodies) <= 1:
+        pages = [f"{title}:\n{body}" for body in bodies]
+    else:
+        pages = [f"{title} (стр. {number}/{len(bodies)}):\n{body}" for number, body in enumerate(bodies, 1)]
+
+    _rendered[key] = (players, pages)
+    while len(_rendered) > RENDER_CACHE_SIZE:
+        _rendered.popitem(last=False)
+    return pages
+
+
+def merge_top(boards, top_k):
+    """Общий топ нескольких досок: boards — [(название, игроки)], результат — [(название, игрок)].
+
+    С каждой доски берутся её top_k лучших игроков, а затем отсортированные списки
+    сливаются кучей, пока не наберётся top_k строк.
+    """
+    def by_score(entry):
+        return entry[1]['score']
+
+    ranked = [[(title, player) for player in heapq.nlargest(top_k, players, key=lambda player: player['score'])]
+              for title, players in boards]
+    return list(islice(heapq.merge(*ranked, key=by_score, reverse=True), top_k))
+
+
+def render_aggregate(boards, top_k):
+    """Текст общего топа нескольких досок."""
+    top = merge_top(boards, top_k)
+    if not top:
+        return "Нет данных об игроках"
+    lines = [f"Общий топ-{top_k} по {len(boards)} доскам:"]
+    lines += [f"{place}. {player['name']} ({title}): {player['score']}"
+              for place, (title, player) in enumerate(top, 1)]
+    return next(paginate_lines(lines))
@@ -0,0 +1,57 @@
+import asyncio
+
+from telegram.ext import BaseUpdateProcessor
+
+
+def chat_key(update):
+    """Ключ, по которому упорядочиваются обновления: ID чата или, если чата нет, пользователя."""
+    chat = getattr(update, 'effective_chat', None)
+    if chat is not None:
+        return chat.id
+    user = getattr(update, 'effective_user', None)
+    return user.id if user is not None else None
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Обрабатывает обновления разных чатов параллельно, а одного чата — строго по очереди.
+
+    Порядок внутри чата нужен ConversationHandler: следующее сообщение пользователя
+    должно обрабатываться уже в новом состоянии диалога. Одновременно выполняется не
+    больше max_concurrent_updates обработчиков; обновления, ждущие своей очереди в
+    чате, слот не занимают, поэтому один «шумный» чат не блокирует остальные.
+    """
+
+    def __init__(self, max_concurrent_updates, max_pending_updates=None):
+        # Семафор базового класса ограничивает число принятых (в том числе ожидающих) обновлений
+        super().__init__(max_pending_updates or max_concurrent_updates * 16)
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        self._chats = {}  # ключ чата -> [asyncio.Lock, сколько обновлений держат или ждут блокировку]
+
+    async def do_process_update(self, update, coroutine):
+        key = chat_key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+
+        entry = self._chats.get(key)
+        if entry is None:
+            entry = self._chats[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0], self._running:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chats[key]
+
+    def active_chats(self):
+        """Количество чатов, у которых есть обрабатываемые или ожидающие обновления."""
+        return len(self._chats)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
@@ -0,0 +1,146 @@
+import asyncio
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+    """Ограничитель частоты «ведро с токенами»: rate токенов в секунду, не больше capacity подряд."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Ждёт, пока в ведре появится токен, и забирает его.
+
+        Ожидающие обслуживаются по очереди, поэтому всплеск запросов растягивается
+        во времени, а не отклоняется.
+        """
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class RateLimiter:
+    """Общее ведро на все запросы плюс отдельное ведро на каждый ключ (токен доски, чат)."""
+
+    def __init__(self, global_rate, key_rate, key_capacity=None, max_keys=10000):
+        self.global_bucket = TokenBucket(global_rate)
+        self.key_rate = key_rate
+        self.key_capacity = key_capacity
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.key_rate, self.key_capacity)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def acquire(self, key=None):
+        """Ждёт разрешения сначала по ключу, затем по общему ведру."""
+        if key is not None:
+            await self._bucket(key).acquire()
+        await self.global_bucket.acquire()
+
+
+class SharedRateLimiter:
+    """То же, что RateLimiter, но вёдра хранятся в файле SQLite и общие для всех процессов.
+
+    Каждое обращение — одна короткая транзакция: токен списывается сразу, даже
+    если ведро пусто (уходит в минус), а вызывающий ждёт, пока долг погасится.
+    Так очередь процессов соблюдает общий лимит без опроса базы. Транзакция может
+    ждать блокировку записи другого процесса, поэтому выполняется в отдельном
+    потоке и не останавливает цикл событий.
+    """
+
+    def __init__(self, path, global_rate, key_rate, key_capacity=None, table='rate_buckets'):
+        self.path = path
+        self.global_rate = global_rate
+        self.key_rate = key_rate
+        self.key_capacity = key_capacity if key_capacity is not None else max(1.0, key_rate)
+        self.table = table
+        self._db = None
+        self._lock = threading.Lock()  # Соединение одно на все потоки asyncio.to_thread
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {self.table} "
+                             f"(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+        return self._db
+
+    def _reserve(self, key, rate, capacity):
+        """Списывает токен из ведра и возвращает, сколько секунд нужно подождать (блокирующий вызов)."""
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = db.execute(f"SELECT tokens, updated FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                tokens -= 1
+                db.execute(f"INSERT OR REPLACE INTO {self.table} (key, tokens, updated) VALUES (?, ?, ?)",
+                           (key, tokens, now))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return max(0.0, -tokens / rate)
+
+    async def acquire(self, key=None):
+        """Ждёт разрешения сначала по ключу, затем по общему ведру."""
+        if key is not None:
+            await asyncio.sleep(await asyncio.to_thread(self._reserve, f"key:{key}", self.key_rate,
+                                                        self.key_capacity))
+        await asyncio.sleep(await asyncio.to_thread(self._reserve, 'global', self.global_rate,
+                                                    max(1.0, self.global_rate)))
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def backoff_delay(attempt, base=0.5, cap=10.0):
+    """Экспоненциальная задержка перед повтором с полным джиттером (attempt начинается с 0)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def parse_retry_after(value):
+    """Значение заголовка Retry-After (число секунд или HTTP-дата) в секундах или None."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
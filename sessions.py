@@ -0,0 +1,100 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+
+
+class SessionStore:
+    """Хранилище сессий чатов в памяти (без сохранения между перезапусками).
+
+    Сессия — это словарь с данными чата, например {'token': ...}. Изменённую
+    сессию нужно явно сохранить через set().
+    """
+
+    def __init__(self):
+        self._sessions = {}
+
+    def get(self, chat_id):
+        """Возвращает сессию чата или None."""
+        return self._sessions.get(chat_id)
+
+    def set(self, chat_id, session):
+        """Сохраняет сессию чата."""
+        self._sessions[chat_id] = session
+
+    def delete(self, chat_id):
+        """Удаляет сессию чата."""
+        self._sessions.pop(chat_id, None)
+
+    def __len__(self):
+        """Количество сессий, загруженных в память."""
+        return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Хранилище сессий в SQLite с ленивой загрузкой и вытеснением простаивающих сессий.
+
+    В памяти держатся только недавно активные чаты: сессия читается из базы при
+    первом обращении и выгружается после max_idle секунд простоя или когда
+    загруженных сессий становится больше max_active. В базе сессия остаётся.
+    """
+
+    def __init__(self, path, max_idle=3600.0, max_active=10000):
+        self.path = path
+        self.max_idle = max_idle
+        self.max_active = max_active
+        self._sessions = OrderedDict()  # chat_id -> (время последнего обращения, сессия)
+        self._db = None
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS sessions (chat_id INTEGER PRIMARY KEY, data TEXT NOT NULL)")
+        return self._db
+
+    def get(self, chat_id):
+        entry = self._sessions.get(chat_id)
+        if entry is not None:
+            session = entry[1]
+        else:
+            row = self._connect().execute("SELECT data FROM sessions WHERE chat_id = ?", (chat_id,)).fetchone()
+            if row is None:
+                return None
+            session = json.loads(row[0])
+        self._touch(chat_id, session)
+        return session
+
+    def set(self, chat_id, session):
+        db = self._connect()
+        with db:
+            db.execute("INSERT OR REPLACE INTO sessions (chat_id, data) VALUES (?, ?)",
+                       (chat_id, json.dumps(session, ensure_ascii=False)))
+        self._touch(chat_id, session)
+
+    def delete(self, chat_id):
+        db = self._connect()
+        with db:
+            db.execute("DELETE FROM sessions WHERE chat_id = ?", (chat_id,))
+        self._sessions.pop(chat_id, None)
+
+    def _touch(self, chat_id, session):
+        now = time.monotonic()
+        self._sessions[chat_id] = (now, session)
+        self._sessions.move_to_end(chat_id)
+        self.evict_idle(now)
+
+    def evict_idle(self, now=None):
+        """Выгружает из памяти простаивающие сессии (в базе они остаются)."""
+        now = time.monotonic() if now is None else now
+        while self._sessions:
+            chat_id, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access <= self.max_idle and len(self._sessions) <= self.max_active:
+                break
+            del self._sessions[chat_id]
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
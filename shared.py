@@ -0,0 +1,142 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class SQLiteStore:
+    """Общее для нескольких процессов хранилище «ключ -> (время записи, значение)» в файле SQLite.
+
+    Значения хранятся как JSON, время — по часам системы (time.time), чтобы его
+    одинаково понимали все процессы. Методы блокирующие: из асинхронного кода их
+    вызывают через asyncio.to_thread, поэтому соединение общее для потоков и
+    защищено блокировкой.
+    """
+
+    def __init__(self, path, table='shared_store'):
+        self.path = path
+        self.table = table
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._db is None:
+            # timeout: сколько ждать, пока запись держит другой процесс
+            self._db = sqlite3.connect(self.path, timeout=10.0, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {self.table} "
+                             f"(key TEXT PRIMARY KEY, ts REAL NOT NULL, value TEXT NOT NULL)")
+        return self._db
+
+    def get(self, key):
+        """(время записи, значение) или None."""
+        with self._lock:
+            row = self._connect().execute(f"SELECT ts, value FROM {self.table} WHERE key = ?",
+                                          (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row is not None else None
+
+    def set(self, key, value, ts=None):
+        raw = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.execute(f"INSERT OR REPLACE INTO {self.table} (key, ts, value) VALUES (?, ?, ?)",
+                           (key, time.time() if ts is None else ts, raw))
+
+    def update(self, key, transform):
+        """Атомарно заменяет значение на transform((время, значение) или None), сохраняя время записи.
+
+        Если transform вернул None, запись удаляется.
+        """
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute(f"SELECT ts, value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                value = transform((row[0], json.loads(row[1])) if row is not None else None)
+                if value is None:
+                    db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                else:
+                    db.execute(f"UPDATE {self.table} SET value = ? WHERE key = ?",
+                               (json.dumps(value, ensure_ascii=False), key))
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+
+    def delete(self, key):
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def prune(self, max_size):
+        """Оставляет max_size самых свежих записей; возвращает, сколько записей осталось."""
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.execute(f"DELETE FROM {self.table} WHERE key NOT IN "
+                           f"(SELECT key FROM {self.table} ORDER BY ts DESC LIMIT ?)", (max_size,))
+            return db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class RedisStore:
+    """То же хранилище в Redis — для процессов на разных машинах (нужен пакет redis).
+
+    Записи автоматически удаляются через expire секунд после последней записи.
+    """
+
+    def __init__(self, url, prefix='scorebot:', expire=86400):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Для хранилища в Redis нужен пакет redis: pip install redis")
+        self._redis = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.expire = expire
+
+    def get(self, key):
+        raw = self._redis.get(self.prefix + key)
+        if raw is None:
+            return None
+        ts, value = json.loads(raw)
+        return ts, value
+
+    def set(self, key, value, ts=None):
+        self._redis.set(self.prefix + key, json.dumps([time.time() if ts is None else ts, value], ensure_ascii=False),
+                        ex=self.expire)
+
+    def update(self, key, transform):
+        """Как SQLiteStore.update, но не атомарно: одновременная запись другого процесса может потеряться."""
+        entry = self.get(key)
+        value = transform(entry)
+        if value is None:
+            self.delete(key)
+        else:
+            self.set(key, value, entry[0])
+
+    def delete(self, key):
+        self._redis.delete(self.prefix + key)
+
+    def prune(self, max_size):
+        """Старые записи Redis удаляет сам по expire; размер хранилища не считается."""
+        return None
+
+    def close(self):
+        self._redis.close()
+
+
+def open_store(url):
+    """Хранилище по адресу: sqlite:///путь/к/файлу или redis://хост:порт/база."""
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStore(url)
+    raise ValueError(f"Неизвестное общее хранилище: {url}")
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+from telegram.ext import BaseRateLimiter
+
+from ratelimit import RateLimiter, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Запросы к Bot API, которые безопасно повторять после сетевой ошибки:
+# повторное редактирование или ответ на нажатие не создаёт дубликатов
+IDEMPOTENT_ENDPOINTS = frozenset({'editMessageText', 'editMessageReplyMarkup', 'answerCallbackQuery',
+                                  'pinChatMessage', 'getMe'})
+
+
+class TelegramRateLimiter(BaseRateLimiter):
+    """Ограничивает исходящие запросы к Telegram теми же ведрами токенов, что и запросы к API.
+
+    Используется общее ведро на бота и отдельное на каждый чат. При RetryAfter
+    запрос повторяется через указанное Telegram время; редактирование сообщений и
+    ответы на нажатия дополнительно повторяются при сетевых ошибках с экспоненциальным
+    откатом и джиттером.
+    """
+
+    def __init__(self, global_rate=30.0, chat_rate=1.0, chat_burst=3, max_retries=3, base_delay=0.5,
+                 max_delay=30.0):
+        self.limiter = RateLimiter(global_rate, chat_rate, chat_burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire(chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = e.retry_after
+                delay = delay.total_seconds() if hasattr(delay, 'total_seconds') else float(delay)
+                logger.warning(f"Telegram просит подождать {delay} с перед {endpoint}")
+            except BadRequest:
+                # BadRequest — подкласс NetworkError, но ошибка постоянная: повтор ничего не изменит
+                raise
+            except (TimedOut, NetworkError) as e:
+                if endpoint not in IDEMPOTENT_ENDPOINTS or attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                logger.warning(f"Сетевая ошибка Telegram на {endpoint}: {e}, повтор")
+            await asyncio.sleep(min(delay, self.max_delay))
@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import json
+import logging
+
+from telegram.error import BadRequest, Forbidden
+
+from api import get_board_data
+
+logger = logging.getLogger(__name__)
+
+
+def board_fingerprint(board_data):
+    """Хэш содержимого доски, по которому видно, изменилась ли таблица."""
+    players = sorted(((str(player['id']), player['name'], player['score'])
+                      for player in board_data.get('players') or []))
+    title = (board_data.get('board') or {}).get('appearance', {}).get('title')
+    return hashlib.sha1(json.dumps([title, players], ensure_ascii=False).encode()).hexdigest()
+
+
+class BoardWatcher:
+    """Фоновый опрос одной доски, общий для всех чатов, которые на неё подписаны.
+
+    Пока таблица меняется, доска опрашивается раз в min_interval секунд; если
+    изменений нет, интервал растёт до max_interval. Сообщения подписчиков
+    редактируются только когда изменилась отрисованная таблица.
+    """
+
+    def __init__(self, manager, token):
+        self.manager = manager
+        self.token = token
+        self.subscribers = {}  # chat_id -> message_id
+        self.fingerprint = None
+        self.text = None
+        self.interval = manager.min_interval
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self.subscribers:
+            try:
+                await self.poll()
+            except Exception as e:
+                # Сетевая ошибка или исчерпанный RetryAfter не должны останавливать опрос:
+                # сбрасываем отпечаток, чтобы при следующем успешном опросе обновить все сообщения
+                logger.warning(f"Ошибка опроса доски {self.token}: {e}")
+                self.fingerprint = self.text = None
+                self.interval = min(self.interval * 2, self.manager.max_interval)
+            await asyncio.sleep(self.interval)
+
+    async def poll(self):
+        """Один опрос доски; при изменении обновляет сообщения всех подписчиков."""
+        board_data = await get_board_data(self.token, fresh=True)
+        if not board_data:
+            self.interval = min(self.interval * 2, self.manager.max_interval)
+            return
+
+        fingerprint = board_fingerprint(board_data)
+        if fingerprint == self.fingerprint:
+            self.interval = min(self.interval * 1.5, self.manager.max_interval)
+            return
+        self.fingerprint = fingerprint
+        self.interval = self.manager.min_interval
+
+        text = self.manager.render(board_data)
+        if text == self.text:
+            return
+        self.text = text
+        for chat_id, message_id in list(self.subscribers.items()):
+            await self.manager.edit(chat_id, message_id, text)
+
+
+class WatchManager:
+    """Подписки чатов на живую таблицу: одно закреплённое сообщение на чат, один опрос на доску."""
+
+    def __init__(self, bot, render, min_interval=5.0, max_interval=60.0):
+        self.bot = bot
+        self.render = render  # board_data -> текст сообщения
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.watchers = {}  # token -> BoardWatcher
+        self.subscriptions = {}  # chat_id -> token
+
+    async def subscribe(self, chat_id, token):
+        """Отправляет и закрепляет сообщение с таблицей и подписывает на него чат.
+
+        Возвращает False, если данные доски получить не удалось. Прежнее сообщение
+        с таблицей в этом чате открепляется.
+        """
+        previous = self.unsubscribe(chat_id)
+        if previous is not None:
+            try:
+                await self.bot.unpin_chat_message(chat_id, previous)
+            except (BadRequest, Forbidden) as e:
+                logger.warning(f"Не удалось открепить сообщение в чате {chat_id}: {e}")
+        board_data = await get_board_data(token)
+        if not board_data:
+            return False
+
+        watcher = self.watchers.get(token)
+        text = watcher.text if watcher and watcher.text else self.render(board_data)
+        message = await self.bot.send_message(chat_id, text)
+        try:
+            await self.bot.pin_chat_message(chat_id, message.message_id, disable_notification=True)
+        except (BadRequest, Forbidden) as e:
+            logger.warning(f"Не удалось закрепить сообщение в чате {chat_id}: {e}")
+
+        # Пока сообщение отправлялось, другой чат мог создать или остановить опрос этой доски
+        watcher = self.watchers.get(token)
+        if watcher is None:
+            watcher = self.watchers[token] = BoardWatcher(self, token)
+            watcher.fingerprint, watcher.text = board_fingerprint(board_data), text
+            watcher.subscribers[chat_id] = message.message_id
+            watcher.start()
+        else:
+            watcher.subscribers[chat_id] = message.message_id
+            if watcher.task.done():
+                watcher.start()
+        self.subscriptions[chat_id] = token
+        return True
+
+    def unsubscribe(self, chat_id):
+        """Отписывает чат; опрос доски останавливается, когда уходит последний подписчик.
+
+        Возвращает message_id закреплённого сообщения или None.
+        """
+        token = self.subscriptions.pop(chat_id, None)
+        watcher = self.watchers.get(token)
+        if watcher is None:
+            return None
+        message_id = watcher.subscribers.pop(chat_id, None)
+        if not watcher.subscribers:
+            watcher.task.cancel()
+            del self.watchers[token]
+        return message_id
+
+    async def edit(self, chat_id, message_id, text):
+        try:
+            await self.bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                logger.warning(f"Сообщение с таблицей в чате {chat_id} недоступно ({e}), подписка снята")
+                self.unsubscribe(chat_id)
+        except Forbidden:
+            self.unsubscribe(chat_id)
+
+    async def close(self):
+        """Останавливает все опросы."""
+        for watcher in self.watchers.values():
+            watcher.task.cancel()
+        self.watchers.clear()
+        self.subscriptions.clear()
@@ -0,0 +1,195 @@
+"""Режим нескольких процессов: супервизор получает обновления и раздаёт их рабочим процессам.
+
+Обновления распределяются по chat_id (chat_id % WORKER_COUNT), поэтому все
+обновления одного чата обрабатывает один процесс и порядок диалога сохраняется.
+Сессии и состояния диалогов уже лежат в общем файле SQLite; кэш досок и лимиты
+запросов к API тоже становятся общими (см. configure_worker). Упавший процесс
+супервизор перезапускает.
+
+Запуск: RUN_MODE = "workers" в main.py, затем python main.py.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+
+from telegram import Bot, Update
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+from telegram.ext import ApplicationBuilder
+
+import api
+import main
+from cache import SharedBoardCache
+from processing import chat_key
+from ratelimit import SharedRateLimiter, backoff_delay
+from shared import open_store
+
+logger = logging.getLogger(__name__)
+
+WORKER_COUNT = os.cpu_count() or 1  # Сколько рабочих процессов запускать
+# Общее хранилище кэша досок: None — файл SQLite SESSION_DB_PATH (процессы на одной машине),
+# "redis://хост:6379/0" — Redis (нужен пакет redis), если кэш нужен нескольким машинам
+SHARED_STORE_URL = None
+WORKER_RESTART_DELAY = 1.0  # Пауза перед перезапуском упавшего процесса, секунды
+WORKER_STOP_TIMEOUT = 10.0  # Сколько ждать завершения процесса при остановке, секунды
+POLL_TIMEOUT = 30  # Таймаут long polling getUpdates, секунды
+POLL_RETRY_MAX_DELAY = 30.0  # Наибольшая пауза между повторами getUpdates после сетевой ошибки, секунды
+MP_START_METHOD = "spawn"  # Способ запуска процессов multiprocessing
+
+
+def configure_worker(index, count):
+    """Настраивает процесс index из count на общее состояние.
+
+    Кэш досок и лимиты запросов к keepthescore хранятся в общей базе, поэтому
+    процессы не запрашивают одну доску по нескольку раз и вместе не превышают
+    лимиты. Чаты между процессами не пересекаются, так что лимит Telegram на чат
+    остаётся локальным, а общий лимит бота делится поровну. Эндпоинт метрик у
+    каждого процесса свой: METRICS_PORT + index.
+    """
+    api.rate_limiter = SharedRateLimiter(main.SESSION_DB_PATH, api.API_GLOBAL_RATE, api.API_BOARD_RATE,
+                                         api.API_BOARD_BURST)
+    api.board_cache = SharedBoardCache(open_store(SHARED_STORE_URL or f"sqlite:///{main.SESSION_DB_PATH}"),
+                                       api.BOARD_CACHE_SIZE, api.BOARD_CACHE_TTL)
+    main.TELEGRAM_GLOBAL_RATE = main.TELEGRAM_GLOBAL_RATE / count
+    if main.METRICS_PORT:
+        main.METRICS_PORT += index
+
+
+async def serve_worker(queue, builder=None):
+    """Обрабатывает обновления из очереди, пока не придёт None."""
+    application = main.build_application((builder or ApplicationBuilder()).updater(None))
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    try:
+        while True:
+            data = await asyncio.to_thread(queue.get)
+            if data is None:
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+    finally:
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+
+def worker_main(index, count, queue):
+    """Точка входа рабочего процесса."""
+    # Остановку процессов по Ctrl+C выполняет супервизор, отправляя None в очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_worker(index, count)
+    asyncio.run(serve_worker(queue))
+
+
+class Supervisor:
+    """Запускает рабочие процессы, раздаёт им обновления по chat_id и перезапускает упавшие."""
+
+    def __init__(self, count=WORKER_COUNT, target=worker_main):
+        self.count = count
+        self.target = target
+        self.context = multiprocessing.get_context(MP_START_METHOD)
+        self.queues = [self.context.Queue() for _ in range(count)]
+        self.processes = [None] * count
+        self.restarts = 0
+
+    def start_worker(self, index):
+        process = self.context.Process(target=self.target, args=(index, self.count, self.queues[index]),
+                                       name=f"scorebot-worker-{index}")
+        process.start()
+        self.processes[index] = process
+        logger.info(f"Запущен рабочий процесс {index} (pid {process.pid})")
+
+    def start(self):
+        for index in range(self.count):
+            self.start_worker(index)
+
+    def shard(self, update):
+        """Номер процесса для обновления; обновления без чата получает процесс 0."""
+        key = chat_key(update)
+        return key % self.count if key is not None else 0
+
+    def dispatch(self, update):
+        self.queues[self.shard(update)].put(update.to_dict())
+
+    async def watch_workers(self):
+        """Перезапускает рабочие процессы, которые завершились без команды."""
+        while True:
+            await asyncio.sleep(WORKER_RESTART_DELAY)
+            for index, process in enumerate(self.processes):
+                if process is not None and not process.is_alive():
+                    logger.error(f"Рабочий процесс {index} завершился с кодом {process.exitcode}, перезапуск")
+                    # Упавший процесс мог оставить захваченной блокировку чтения очереди, поэтому
+                    # новому процессу нужна новая очередь; ещё не полученные обновления теряются
+                    self.queues[index] = self.context.Queue()
+                    self.restarts += 1
+                    self.start_worker(index)
+
+    async def poll(self, bot):
+        """Получает обновления long polling и раздаёт их процессам.
+
+        Сетевые ошибки и RetryAfter не останавливают бота: запрос повторяется с
+        экспоненциальным откатом или через указанное Telegram время.
+        """
+        await bot.delete_webhook()
+        offset = None
+        failures = 0
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT,
+                                                allowed_updates=Update.ALL_TYPES)
+            except RetryAfter as e:
+                delay = e.retry_after
+                delay = delay.total_seconds() if hasattr(delay, 'total_seconds') else float(delay)
+                logger.warning(f"Telegram просит подождать {delay} с перед getUpdates")
+                await asyncio.sleep(delay)
+                continue
+            except BadRequest:
+                raise  # Постоянная ошибка (подкласс NetworkError), повтор не поможет
+            except (TimedOut, NetworkError) as e:
+                delay = backoff_delay(failures, cap=POLL_RETRY_MAX_DELAY)
+                failures = min(failures + 1, 10)
+                logger.warning(f"Ошибка getUpdates: {e}, повтор через {delay:.1f} с")
+                await asyncio.sleep(delay)
+                continue
+            failures = 0
+            for update in updates:
+                self.dispatch(update)
+                offset = update.update_id + 1
+
+    def stop(self):
+        """Просит процессы завершиться и ждёт их; зависшие завершает принудительно."""
+        for queue in self.queues:
+            queue.put(None)
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            process.join(WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                logger.warning(f"Рабочий процесс {index} не завершился, останавливаю принудительно")
+                process.terminate()
+                process.join()
+            self.processes[index] = None
+
+    async def run(self, bot):
+        self.start()
+        watcher = asyncio.create_task(self.watch_workers())
+        try:
+            async with bot:
+                await self.poll(bot)
+        finally:
+            watcher.cancel()
+            self.stop()
+
+
+def run_supervisor():
+    """Запуск бота в режиме нескольких процессов."""
+    supervisor = Supervisor()
+    try:
+        asyncio.run(supervisor.run(Bot(main.BOT_TOKEN)))
+    except KeyboardInterrupt:
+        pass